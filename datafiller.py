@@ -64,6 +64,64 @@ Run with C<--test=comics> and look at the output for a didactic example.
 
 =over 4
 
+=item C<--bench>
+
+Run benchmarks and write their results as JSON to the output.
+Each data generator is run on its own table of the embedded I<bench> schema,
+each target and format formats the tuples of the whole I<bench> schema, and
+the B<comics> and B<pgbench> scripts are generated for PostgreSQL.
+Sizes are one hundredth, one tenth and all of C<--size>, which defaults
+to 10000 for benchmarks.
+Each result gives the number of rows and bytes generated per second,
+for the best of three runs, and the peak resident memory of a process
+forked for this benchmark.
+
+Example: --bench --size=100000 -o bench.json
+
+=item C<--baseline FILE>
+
+Compare the benchmark results to those in this JSON file, as written by
+a previous C<--bench> run. Results with fewer rows per second than the
+baseline by more than the C<--threshold> are reported as regressions,
+and the exit status is then 1.
+Timings on small sizes are noisy, so results which take less than 0.1 seconds
+are not compared. Use a large C<--size> for baselines.
+
+Default is not to compare.
+
+=item C<--cache DIR>
+
+Save the parsed schema with its data generators in this directory,
+under a hash of the input, the options and the version, and reuse it
+in later runs with the same input and options instead of parsing again.
+The schema is parsed again if a word file it uses changed.
+Dates and timestamps without B<start> or B<end> directives are still
+relative to the current time.
+The schema is only saved with a seed, from the C<--seed> option or the B<seed>
+directive, as generators are otherwise set up differently on each run.
+
+Default is not to cache.
+
+=item C<--chunk SIZE>
+
+Number of tuples generated together, column by column, before being output.
+Larger chunks are faster but require more memory.
+
+Default is 10000.
+
+=item C<--compress (gzip|lzma|zstd)> or C<-Z ...>
+
+Compress the output, and the per-table data files of C<--format=binary>,
+which get a F<.gz>, F<.xz> or F<.zst> suffix and are loaded through
+the matching decompression program.
+The output is cut in blocks of C<--buffer> bytes, which are compressed
+independently by threads, one per processor, while data are generated.
+The result is a sequence of gzip members, xz streams or zstd frames,
+which the usual tools decompress as one file.
+B<zstd> compression requires the I<zstandard> python module.
+
+Default is not to compress.
+
 =item C<--debug> or C<-D>
 
 Set debug mode.
@@ -85,10 +143,48 @@ execution to the database command.
 
 Default is to only ouput generated data.
 
+=item C<--format (text|binary)> or C<-F ...>
+
+Format of generated data.
+With B<binary>, which is only available for PostgreSQL, the data of each
+table is written in the binary COPY format to a F<table.pgcopy> file
+in the directory set by option C<--directory>,
+and the output script loads these files with psql's C<\\copy>.
+Timestamps with time zone are considered in UTC, unless directive B<tz>
+is a numerical offset such as C<+02>.
+
+Default is B<text>.
+
+=item C<--directory DIR>
+
+Directory for per-table data files, and for spool files of tables
+generated by other processes with C<--jobs>.
+
+Default is the current directory.
+
 =item C<--help> or C<-h>
 
 Show basic help.
 
+=item C<--jobs NUM> or C<-j NUM>
+
+Number of processes to generate tables in parallel.
+Tables are generated largest first, and output in their schema order.
+The random generation is seeded per table, so that the output is the same
+whatever the number of processes.
+Each table is written whole in a spool file under C<--directory> until it
+is copied to the output in schema order, so the directory may need as much
+free space as the whole output.
+
+Default is 1.
+
+=item C<--level NUM>
+
+Compression level for C<--compress>, from 0 to 9 for B<gzip> and B<lzma>,
+and from 1 to 22 for B<zstd>.
+
+Default is 6 for B<gzip> and B<lzma>, and 3 for B<zstd>.
+
 =item C<--man> or C<-m>
 
 Show full man page based on POD. Yes, the perl thing:-)
@@ -119,18 +215,91 @@ for larger tests.
 Default is 1, which can be overriden by the B<offset> directive at
 the schema level, or per-attribute provided B<offset>.
 
+=item C<--output FILE> or C<-o FILE>
+
+Write output to this file.
+
+Default is to write to standard output.
+
+=item C<--buffer SIZE>
+
+Size in bytes of the output buffer, which is written when full.
+
+Default is 1048576.
+
+=item C<--plan>
+
+Show a plan of the generation instead of the data: for each table,
+the number of tuples, the output size, the peak memory used to check
+compound unique keys of the generated tuples, and the generation time.
+Sizes are resolved as for a generation, and the output size and time
+are extrapolated from a sample of 1000 tuples per table.
+Tables generated in separate files with C<--format=binary> are included
+in the output size.
+
+Default is to generate data.
+
 =item C<--pod COMMAND>
 
 Override pod conversion command used by option C<--man>.
 
 Default is 'pod2usage -verbose 3'.
 
+=item C<--profile>
+
+Show on standard error, at the end of the generation, the wall time,
+number of calls and number of rows per table, per attribute generator,
+per compound unique check with the number of retried tuples,
+and per table formatting for the target, slowest first.
+Table times include their attributes and unique checks.
+
+Default is not to profile.
+
+=item C<--progress SECONDS>
+
+Report on standard error every I<SECONDS> seconds and when a table is done,
+the number of tuples generated out of the table size, the table rate in
+tuples per second, the bytes output for the table, and the estimated time
+to complete the table and the whole run.
+The clock is read once per chunk of tuples, see C<--chunk>.
+
+Default is not to report progress.
+
+=item C<--pstats FILE>
+
+Run under the python profiler and save its statistics in this file,
+to be analysed with the I<pstats> module.
+Tables generated by other processes with C<--jobs> are not included.
+
+Default is not to.
+
 =item C<--seed SEED> or C<-S SEED>
 
 Seed random generated with provided string.
+The same seed generates the same data with the same version and options,
+provided that I<numpy> is either installed or not for all runs, as tuples
+are drawn differently with it. The output header tells which is the case.
 
 Default uses OS supplied randomness or current time.
 
+=item C<--shard K/N>
+
+Generate only part I<K> of I<N> of the tuples of each table,
+for instance to run I<N> processes or hosts in parallel on a large table.
+Setup (drop, input, truncate) is only output by the first shard, and
+sequence restarts and analyzes by the last one.
+Generated tuples only depend on the seed, the table and the chunk they
+belong to, so that all parts together hold the same data as
+a single run, provided that the C<--seed> and C<--chunk> options are the same
+and that all shards run with I<numpy>, or all without it, as shown in the
+first line of their output.
+A seed is required, from the C<--seed> option or the B<seed> directive.
+Tables with compound unique constraints are nevertheless generated from their
+first tuple so as to register previous keys, unless they use the B<product>
+directive.
+
+Default is to generate all tuples.
+
 =item C<--size SIZE>
 
 Set overall scaling. The size is combined with the B<mult> directive value
@@ -145,19 +314,42 @@ Target database engine. MySQL support is really experimental.
 
 Default is to target PostgreSQL.
 
+=item C<--target-bytes BYTES>
+
+Choose the size so that the output is about I<BYTES>, which may be
+followed by a decimal unit I<k>, I<M>, I<G> or I<T>, as in C<500G>.
+The size is solved from the formatted width of a sample of tuples for
+each table, as tables without a B<size> directive grow with the size,
+and refined as widths may change with the size.
+The chosen size and the predicted output per table are shown on
+standard error, see also C<--plan>.
+
+Default is to use C<--size>.
+
 =item C<--test=(comics|pgbench|validate)> or C<--test='int:directives...'>
 
 Output test data for B<comics> or B<pgbench> schemas (see L</EXAMPLE> below),
 or the internal validation,
-or run tests for bool, integer, float or blob generators with some directives.
+or run tests for bool, integer, float, blob or text generators with some
+directives.
 
 Example: --test='bool:rate=0.3' may show I<True: 30.68%>,
 stating the rate at which I<True> was actually seen during the test.
 
+Example: --test='text:word=/usr/share/dict/words length=200' shows
+the number of texts of about 200 words generated per second,
+as a benchmark.
+
 Option C<--test=...> sets C<--filter> automatically.
 
 Default is to process argument files or standard input.
 
+=item C<--threshold RATE>
+
+Relative slowdown reported as a regression by C<--baseline>.
+
+Default is 0.2, that is 20%.
+
 =item C<--transaction> or C<-T>
 
 Use a global transaction.
@@ -167,7 +359,7 @@ Default is not to.
 =item C<--tries=NUM>
 
 How hard to try to satisfy a compound unique constraint before giving up
-on a given tuple.
+on a given tuple. See also the B<product> table directive.
 
 Default is 10.
 
@@ -356,10 +548,25 @@ generate.
 
 Do not generate data for this table.
 
+=item B<nomangle>
+
+With B<product>, enumerate keys in order, the first attribute varying
+fastest.
+
 =item B<null>
 
 Set defaut B<null> rate for this table.
 
+=item B<product>
+
+Generate compound unique keys (C<UNIQUE(...)> and C<PRIMARY KEY(...)>)
+by enumerating the product of the sizes of their attributes in a
+pseudo-random order, instead of drawing them and checking them.
+Uniqueness then holds by construction, without retries nor memory.
+The attributes of keys must use integer based generators and not overlap
+between keys, and the table size must not exceed the product of their sizes.
+The generator types of key attributes are ignored.
+
 =item B<size=int>
 
 Use this size, so there is no scaling with the C<--size> option
@@ -497,6 +704,10 @@ The text is chosen uniformly in a list of 23 words, each word being
 built from characters 'abcdef' with the I<skewed> generator described
 in the corresponding macro definition on the line above.
 
+The first 100000 words drawn are kept in memory, which takes about 150 bytes
+per word, and are shared by attributes with the same characters and macro.
+Other words are built again each time they are drawn, which is slower.
+
 =item B<mangle> or B<nomangle>
 
 Whether to automatically choose random B<shift> and B<step> for
@@ -588,6 +799,10 @@ The default B<size> is the size of the word list.
 If the file contents is ordered by word frequency, and the int generator is
 skewed (see B<gen>), the first words can be made to occur more frequently.
 
+A word file is loaded once and shared by all attributes which use it.
+The offsets of its lines are saved in a I<file.dfidx> index next to it,
+if possible, so that it is opened faster in later runs.
+
 =back
 
 =head1 EXAMPLES
@@ -628,6 +843,23 @@ generated with:
 
   sh> datafiller.py -f -T --size=10 tpc-b.sql | psql bench
 
+=head2 LIBRARY
+
+The script can also be imported as a python module. Function C<load_schema>
+parses a schema given as a string or lines, with options named as the long
+command line options. The resulting schema generates the SQL script into
+a file, or iterates over the tuples of a table as python values:
+
+  import io, datafiller
+  schema = datafiller.load_schema(datafiller.PGBENCH, size=10, seed='1')
+  schema.generate(io.BytesIO())
+  schema.generate(open('bench.sql', 'wb'), size=100)
+  for tid, bid, tbalance, filler in schema.rows('pgbench_tellers'):
+      ...
+
+Schemas are independent of one another. A table of a schema is generated
+by one iterator or script at a time.
+
 =head1 BUGS AND FEATURES
 
 All software has bug, this is a software, hence it has bugs.
@@ -644,8 +876,10 @@ Some directives may be ignored in some cases.
 
 Handling of quoted identifiers is partial and may not work at all.
 
-Beware that unique constraint checks for big data generation may require
-a lot of memory.
+Beware that compound unique constraint checks for big data generation
+require memory, from 16 to 32 bytes per key with I<numpy>, half more while
+the index grows, and much more without,
+unless the B<product> table directive is used.
 
 =head1 LICENSE
 
@@ -726,6 +960,35 @@ Various hacks for python 2 & 3 compatibility.
 Make validations stop on errors.
 Check that B<lenvar> is less than B<length>.
 Fixes for B<length> and B<lenvar> overriding in B<string generator>.
+Generate integers and floats by batches, with I<numpy> if available.
+Generate tables by chunks of tuples, see C<--chunk> option.
+Add C<--output> and C<--buffer> options for buffered output.
+Add C<--format> and C<--directory> options for PostgreSQL binary COPY format.
+Add C<--jobs> option to generate tables in parallel.
+Add C<--shard> option to generate part of tables, and tell in the output
+header whether I<numpy> is used, as random draws depend on it.
+Register compound unique keys as 64-bit hashes.
+Add B<product> table directive to generate compound unique keys.
+Generate chars words once and share them between attributes.
+Choose string lengths with a stable hash, so that outputs do not depend on
+the python hash seed.
+Share word files between attributes and processes, and index their lines.
+Generate blobs from bulk random bytes.
+Compute dates and timestamps on integers and format them faster,
+which also allows dates before 1900.
+Generate texts by chunks, and add a text generator test.
+Parse schemas faster, and look up enum types by name.
+Add C<--cache> option to reuse parsed schemas.
+Allow to import the script as a module, see L</"LIBRARY">.
+Start faster by loading I<numpy> and compiling regular expressions only
+when needed, and install a I<datafiller> command which runs the
+byte-compiled module.
+Add C<--bench>, C<--baseline> and C<--threshold> options for benchmarks.
+Add C<--profile> and C<--pstats> options to find out where time is spent.
+Add C<--progress> option to report progress and estimated times.
+Add C<--plan> option to predict output size, memory and time.
+Add C<--target-bytes> option to choose the size from an output volume.
+Add C<--compress> and C<--level> options to compress output in threads.
 
 =item B<version 1.1.1 (r250 on 2013-06-29)>
 
@@ -948,11 +1211,11 @@ CREATE TABLE df.Ten( -- df: size=10 null=1.0
 , x2 TEXT NOT NULL CHECK(x2::DOUBLE PRECISION >=0 AND
                          x2::DOUBLE PRECISION <= 100.0)
                          -- df: type=float alpha=0.0 beta=100.0
-, x3 TEXT NOT NULL CHECK(x3 ~ '^\d{4}-\d\d-\d\d$') -- df: type=date
-, x4 TEXT NOT NULL CHECK(x4 ~ '^\d{4}-\d\d-\d\d \d\d:\d\d:\d\d$')
+, x3 TEXT NOT NULL CHECK(x3 ~ '^\\d{4}-\\d\\d-\\d\\d$') -- df: type=date
+, x4 TEXT NOT NULL CHECK(x4 ~ '^\\d{4}-\\d\\d-\\d\\d \\d\\d:\\d\\d:\\d\\d$')
                         -- df: type=timestamp
 , x5 TEXT NOT NULL CHECK(x5 LIKE 'boo%') -- df: type=string prefix=boo
-, x6 TEXT NOT NULL CHECK(x6 ~ '^\d+\s\w+$') -- df: type=interval unit='day'
+, x6 TEXT NOT NULL CHECK(x6 ~ '^\\d+\\s\\w+$') -- df: type=interval unit='day'
   -- more forced generators
 , y0 INTEGER NOT NULL CHECK(y0 BETWEEN 2 AND 29)
      -- df: type=word word=:2,3,5,7,11,13,17,19,23,29
@@ -1154,6 +1417,47 @@ COMICS = """
 
 """
 
+BENCH = """
+  -- one table per data generator, for benchmarks
+
+  -- df: size=10000
+
+  CREATE TABLE bench_bool(
+    b BOOLEAN NOT NULL
+  );
+  CREATE TABLE bench_int(
+    i INTEGER NOT NULL
+  );
+  CREATE TABLE bench_float(
+    f DOUBLE PRECISION NOT NULL
+  );
+  CREATE TABLE bench_date(
+    d DATE NOT NULL
+  );
+  CREATE TABLE bench_timestamp(
+    t TIMESTAMP NOT NULL
+  );
+  CREATE TABLE bench_interval(
+    v INTERVAL NOT NULL
+  );
+  CREATE TABLE bench_string(
+    s TEXT NOT NULL
+  );
+  CREATE TABLE bench_chars(
+    c TEXT NOT NULL -- df: chars='abcdefghij' length=12 lenvar=4
+  );
+  CREATE TABLE bench_word(
+    w TEXT NOT NULL -- df: word=:calvin,hobbes,susie,rosalyn,moe,wormwood
+  );
+  CREATE TABLE bench_text(
+    x TEXT NOT NULL
+      -- df: text word=:calvin,hobbes,susie,rosalyn,moe,wormwood length=8 lenvar=2
+  );
+  CREATE TABLE bench_blob(
+    o BYTEA NOT NULL
+  );
+"""
+
 # re helpers: alas this is not a parser.
 
 # identifier
@@ -1175,36 +1479,67 @@ re_boo=r'BOOL(EAN)?'
 
 re_type='|'.join([re_int, re_flt, re_txt, re_tim, re_boo, re_blo])
 
-# SQL syntax
-new_object = re.compile(r"^\s*({0})\s".format(re_cmd), re.I)
-create_table = \
-    re.compile(r'^\s*CREATE\s+TABLE\s*({0})\s*\('.format(re_ident2), re.I)
-create_enum = \
-    re.compile(r'^\s*CREATE\s+TYPE\s+({0})\s+AS\s+ENUM'.format(re_ident2))
-column = re.compile(r'^\s*,?\s*({0})\s+({1})'.format(re_ident, re_type), re.I)
-reference = \
-  re.compile(r'.*\sREFERENCES\s+({0})\s*(\(({1})\))?'. \
-             format(re_ident2, re_ident), re.I)
-primary_key = re.compile('.*\sPRIMARY\s+KEY', re.I)
-unique = re.compile(r'.*\sUNIQUE', re.I)
-not_null = re.compile(r'.*\sNOT\s+NULL', re.I)
-unicity = re.compile(r'^\s*(UNIQUE|PRIMARY\s+KEY)\s*\(([^\)]+)\)', re.I)
-
-# detect datafiller directives
-df_mac = re.compile(r'.*--\s*df\s+(\w+)\s*:\s*(.*)')
-df_dir = re.compile(r'.*--\s*df\s*:\s*(.*)')
-df_txt = re.compile(r'(\w+)=\'([^\']*)\'\s+(.*)')
-df_flt = re.compile(r'(\w+)=(-?\d+\.\d*)\s+(.*)')
-df_int = re.compile(r'(\w+)=(-?\d+)\s+(.*)')
-df_str = re.compile(r'(\w+)=(\S*)\s+(.*)')
-df_bol = re.compile(r'(\w+)\s+(.*)')
-
-# remove SQL comments & \xxx commands
-comments = re.compile(r'(.*?)\s*--.*')
-backslash = re.compile(r'\s*\\')
+# regular expressions are compiled when a schema is first created,
+# so that commands which do not parse anything start faster
+new_object = None
+
+def compileParser():
+    global new_object, create_table, create_enum, column, column_other, \
+        reference, constraint, unicity, re_quoted, \
+        df_mac, df_dir, df_txt, df_flt, df_int, df_str, df_bol, \
+        comments, backslash
+    if new_object != None:
+        return
+    # SQL syntax
+    new_object = re.compile(r"^\s*({0})\s".format(re_cmd), re.I)
+    create_table = \
+        re.compile(r'^\s*CREATE\s+TABLE\s*({0})\s*\('.format(re_ident2), re.I)
+    create_enum = \
+        re.compile(r'^\s*CREATE\s+TYPE\s+({0})\s+AS\s+ENUM'.format(re_ident2))
+    column = \
+        re.compile(r'^\s*,?\s*({0})\s+({1})'.format(re_ident, re_type), re.I)
+    # column of any type, which is looked up in enums
+    column_other = \
+        re.compile(r'^\s*,?\s*({0})\s+({1})'.format(re_ident, re_ident2))
+    # these are searched anywhere in the line
+    reference = \
+      re.compile(r'\sREFERENCES\s+({0})\s*(\(({1})\))?'. \
+                 format(re_ident2, re_ident), re.I)
+    # column constraints in one pass, identified by their first letter
+    constraint = \
+        re.compile(r'\s(PRIMARY\s+KEY|UNIQUE|NOT\s+NULL|REFERENCES)', re.I)
+    unicity = re.compile(r'^\s*(UNIQUE|PRIMARY\s+KEY)\s*\(([^\)]+)\)', re.I)
+    # quoted SQL strings in enum definitions
+    re_quoted = re.compile(r"[^']*'(([^']|'')*)'(.*)")
+
+    # detect datafiller directives
+    df_mac = re.compile(r'.*--\s*df\s+(\w+)\s*:\s*(.*)')
+    df_dir = re.compile(r'.*--\s*df\s*:\s*(.*)')
+    df_txt = re.compile(r'(\w+)=\'([^\']*)\'\s+(.*)')
+    df_flt = re.compile(r'(\w+)=(-?\d+\.\d*)\s+(.*)')
+    df_int = re.compile(r'(\w+)=(-?\d+)\s+(.*)')
+    df_str = re.compile(r'(\w+)=(\S*)\s+(.*)')
+    df_bol = re.compile(r'(\w+)\s+(.*)')
+
+    # remove SQL comments & \xxx commands
+    comments = re.compile(r'(.*?)\s*--.*')
+    backslash = re.compile(r'\s*\\')
 
 import random
 
+# numpy is optional, it is only used to generate data by batches.
+# it is imported when a schema is first created, as it is slow to load.
+numpy, numpy_loaded = None, False
+
+def loadNumpy():
+    global numpy, numpy_loaded
+    if not numpy_loaded:
+        numpy_loaded = True
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+
 #
 # DATA GENERATORS, with some inheritance
 #
@@ -1219,26 +1554,53 @@ class Generator:
             self.nullp = params['null'] if 'null' in params else \
                 self.att.table.params['null'] \
                     if 'null' in self.att.table.params else \
-                opts.null
+                att.schema.opts.null
         assert self.nullp >= 0.0 and self.nullp <= 1.0, "nullp in [0,1]"
         self.gens, self.size = 0, None
+        # numpy random state, derived from self.random when first needed
+        self.nrandom = None
         if 'seed' in self.params:
 	    # attribute-level seed
             self.random = random.Random()
             self.random.seed(self.params['seed'])
+        elif att != None and att.table != None:
+            # by default, rely on the random generator of the table
+            self.random = att.table.random
         else:
-            # by default, rely on shared random generator
-            self.random = random
+            self.random = random.Random()
     def __str__(self):
         return "{0} size={1} gens={2}".format(type(self), self.size, self.gens)
+    def seek(self, start):
+        # reset random state and counter for generating from data number start
+        if 'seed' in self.params:
+            self.random.seed('{0}:{1}'.format(self.params['seed'], start))
+        self.nrandom = None
+        self.gens = start
     def genData(self): # actual data generation
         raise Exception("not implemented in abstract class")
+    def genBatch(self, n): # generate a list of n data, overriden if faster
+        return [self.genData() for i in range(n)]
+    def getNumpyRandom(self):
+        # deterministic if self.random is seeded
+        if self.nrandom == None:
+            self.nrandom = \
+                numpy.random.RandomState(self.random.randrange(2**32))
+        return self.nrandom
     def getData(self): # get either NULL or a generated data
         # possibly generate a NULL
         if self.nullp != 0.0 and self.random.random() < self.nullp:
-            return db.null()
+            return None
         else:
             return self.genData()
+    def getBatch(self, n): # get a list of n either NULL or generated data
+        if self.nullp == 0.0:
+            return self.genBatch(n)
+        # draw NULLs first, then only generate the non NULL data
+        nulls = (self.getNumpyRandom().random_sample(n) < self.nullp).tolist() \
+                if numpy != None else \
+                [self.random.random() < self.nullp for i in range(n)]
+        data = iter(self.genBatch(n - sum(nulls)))
+        return [None if isnull else next(data) for isnull in nulls]
 
 class BoolGenerator(Generator):
     def __init__(self, att, params=None):
@@ -1249,6 +1611,10 @@ class BoolGenerator(Generator):
         return False if self.rate == 0.0 else \
                True  if self.rate == 1.0 else \
                self.random.random() < self.rate
+    def genBatch(self, n):
+        if numpy == None or self.rate == 0.0 or self.rate == 1.0:
+            return Generator.genBatch(self, n)
+        return (self.getNumpyRandom().random_sample(n) < self.rate).tolist()
 
 class FloatGenerator(Generator):
     def __init__(self, att, params=None):
@@ -1256,6 +1622,15 @@ class FloatGenerator(Generator):
         self.type = self.params.get('gen', 'uniform')
         self.alpha = self.params.get('alpha', 0.0)
         self.beta = self.params.get('beta', 1.0)
+        self.setGenData()
+    def __getstate__(self):
+        d = self.__dict__.copy()
+        del d['genData']
+        return d
+    def __setstate__(self, d):
+        self.__dict__.update(d)
+        self.setGenData()
+    def setGenData(self):
         # genData() is overwritten depending on type
         r, a, b, t = self.random, self.alpha, self.beta, self.type
         self.genData = \
@@ -1273,8 +1648,28 @@ class FloatGenerator(Generator):
         if self.genData == None:
             raise Exception("unexpected float generator type {0}". \
                             format(self.type))
+    def genBatch(self, n):
+        if numpy == None:
+            return Generator.genBatch(self, n)
+        # numpy equivalents of random distributions above
+        r, a, b, t = self.getNumpyRandom(), self.alpha, self.beta, self.type
+        v = r.normal(a, b, n)                      if t == 'gauss'    else \
+            r.beta(a, b, n)                        if t == 'beta'     else \
+            r.exponential(1.0 / a, n)              if t == 'exp'      else \
+            r.gamma(a, b, n)                       if t == 'gamma'    else \
+            r.lognormal(a, b, n)                   if t == 'log'      else \
+            r.normal(a, b, n)                      if t == 'norm'     else \
+            r.pareto(a, n) + 1.0                   if t == 'pareto'   else \
+            r.uniform(a, b, n)                     if t == 'uniform'  else \
+            r.vonmises(a, b, n) % (2.0 * math.pi)  if t == 'vonmises' else \
+            a * r.weibull(b, n)                    if t == 'weibull'  else \
+            None
+        return v.tolist()
 
-from fractions import gcd
+try:
+    from math import gcd
+except ImportError:
+    from fractions import gcd # python 2
 import math
 
 class IntGenerator(Generator):
@@ -1288,6 +1683,8 @@ class IntGenerator(Generator):
         self.type = self.params['gen'] if 'gen' in self.params else \
                     'serial' if att != None and att.isUnique() else \
                     'uniform'
+        # global options, if any
+        opts = att.schema.opts if att != None else None
         # set offset from different sources
         if 'offset' in self.params:
             self.offset = self.params['offset']
@@ -1299,6 +1696,8 @@ class IntGenerator(Generator):
                 fk.params.get('offset', opts.offset if opts.offset else 1)
         else:
             self.offset = 1
+        # whether to mangle shift & step by default
+        self.mangle = opts.mangle if opts != None else False
         # set size, step & shift
         if att != None:
             self.setSize(att.size)
@@ -1311,7 +1710,7 @@ class IntGenerator(Generator):
         if size==0:
             return
         # whether to mangle shift & step
-        mangle = opts.mangle or 'mangle' in self.params \
+        mangle = self.mangle or 'mangle' in self.params \
                  if not 'nomangle' in self.params else False
         # set step
         self.step = self.params.get('step')
@@ -1350,7 +1749,55 @@ class IntGenerator(Generator):
             assert self.alpha>0, "alpha must be >0, got {:f}".format(self.alpha)
         else:
             self.alpha = None
+    # conversion of generated integers, None for plain integers
+    mapData = None
     def genData(self):
+        n = self.intData()
+        return self.mapData(n) if self.mapData else n
+    def genBatch(self, n):
+        ints = self.intBatch(n)
+        return self.mapBatch(ints) if self.mapData else ints
+    def mapBatch(self, ints): # mapData on a list, overriden if faster
+        return [self.mapData(i) for i in ints]
+    def baseBatch(self, bases):
+        # data for given bases in 0..size-1, as generated by intData
+        ints = [self.offset + (self.shift + self.step * b) % self.size
+                for b in bases]
+        return self.mapBatch(ints) if self.mapData else ints
+    def intBatch(self, n):
+        if numpy == None:
+            return [self.intData() for i in range(n)]
+        return self.intArray(n).tolist()
+    def intArray(self, n):
+        # numpy version of intData for n values
+        if self.size == 0:
+            raise Exception("cannot draw from empty set")
+        size, r = int(self.size), self.getNumpyRandom()
+        # set bases in 0..size-1 depending on generator type
+        if size == 1:
+            base = numpy.zeros(n, dtype=numpy.int64)
+        elif self.type == 'serial':
+            base = numpy.arange(self.gens, self.gens + n, dtype=numpy.int64)
+        elif self.type == 'serand':
+            base = numpy.arange(self.gens, self.gens + n, dtype=numpy.int64)
+            over = base >= size
+            base[over] = r.randint(0, size, over.sum(), dtype=numpy.int64)
+        elif self.type == 'uniform':
+            base = r.randint(0, size, n, dtype=numpy.int64)
+        elif self.type == 'power':
+            base = (size * r.random_sample(n) ** self.alpha).astype(numpy.int64)
+        elif self.type == 'scale':
+            v = r.random_sample(n)
+            base = (size * (v / ((1 - self.alpha) * v + self.alpha))). \
+                   astype(numpy.int64)
+        else:
+            raise Exception("unexpected int generator type {0}". \
+                            format(self.type))
+        # update counter
+        self.gens += n
+        # return possibly mangled results
+        return self.offset + (self.shift + self.step * base) % size
+    def intData(self):
         if self.size == 0:
             raise Exception("cannot draw from empty set")
         # set base in 0..size-1 depending on generator type
@@ -1375,13 +1822,11 @@ class IntGenerator(Generator):
         return self.offset + (self.shift + self.step * base) % self.size
 
 # This could also be based on FloatGenerator? '4.2 days' is okay for pg.
+# the generated integer is the number of units
 class IntervalGenerator(IntGenerator):
     def __init__(self, att):
         IntGenerator.__init__(self, att)
         self.unit = self.params.get('unit', 's')
-    def genData(self):
-        # ??? should not depend on db?
-        return db.intervalValue(IntGenerator.genData(self), self.unit)
 
 from datetime import date, timedelta
 
@@ -1409,10 +1854,21 @@ class DateGenerator(IntGenerator):
             dend = DateGenerator.parse(att.params['end'])
             delta = (dend - self.ref) / self.prec
             self.setSize(delta.days+1)
-    def genData(self):
-        d = self.ref + self.dir * \
-            timedelta(days=self.prec * IntGenerator.genData(self))
-        return db.dateValue(d)
+    # dates are computed on day numbers
+    def __setstate__(self, d):
+        self.__dict__.update(d)
+        # a cached generator is relative to the current day
+        if not 'start' in self.params and not 'end' in self.params:
+            self.ref = date.today()
+    def mapData(self, n):
+        return date.fromordinal(self.ref.toordinal() + self.dir * self.prec * n)
+    def mapBatch(self, ints):
+        step = self.dir * self.prec
+        if numpy != None:
+            days = numpy.array(ints, dtype=numpy.int64) * step
+            return (numpy.datetime64(self.ref, 'D') + days).tolist()
+        ref = self.ref.toordinal()
+        return [date.fromordinal(ref + step * n) for n in ints]
 
 from datetime import datetime
 
@@ -1432,7 +1888,7 @@ class TimestampGenerator(IntGenerator):
             self.ref = TimestampGenerator.parse(ref)
             self.dir = 2 * ('start' in att.params) - 1
         else:
-            self.ref = datetime.today()
+            self.ref = datetime.today().replace(microsecond=0)
             self.dir = -1
         # precision, defaults to 60 seconds
         self.prec = att.params.get('prec', 60)
@@ -1440,12 +1896,25 @@ class TimestampGenerator(IntGenerator):
         if start and end:
             dend = TimestampGenerator.parse(att.params['end'])
             delta = (dend - self.ref) / self.prec
-            self.setSize(delta.total_seconds()+1)
-    def genData(self):
-        t = self.ref + self.dir * \
-            timedelta(seconds=self.prec * IntGenerator.genData(self))
-        # TODO: should not depend on db
-        return db.timestampValue(t, self.tz)
+            self.setSize(int(delta.total_seconds())+1)
+    def __setstate__(self, d):
+        self.__dict__.update(d)
+        # a cached generator is relative to the current time
+        if not 'start' in self.params and not 'end' in self.params:
+            self.ref = datetime.today().replace(microsecond=0)
+    # timestamps are computed on seconds
+    def mapData(self, n):
+        return self.ref + timedelta(0, self.dir * self.prec * n)
+    def mapBatch(self, ints):
+        step, ref = self.dir * self.prec, self.ref
+        if numpy != None:
+            # microseconds of ref are kept, as with timedelta
+            secs = numpy.array(ints, dtype=numpy.int64) * step
+            return (numpy.datetime64(ref, 'us') +
+                    secs.astype('timedelta64[s]')).tolist()
+        return [ref + timedelta(0, step * n) for n in ints]
+
+import zlib
 
 class StringGenerator(IntGenerator):
     def __init__(self, att):
@@ -1457,7 +1926,7 @@ class StringGenerator(IntGenerator):
         if clen:
             self.length = int(clen.group(1))
             if re.match('varchar', att.type):
-                self.lenvar = self.length / 4
+                self.lenvar = self.length // 4
                 self.length -= self.lenvar
             else: # char(X)
                 self.lenvar = 0
@@ -1466,42 +1935,205 @@ class StringGenerator(IntGenerator):
                                      self.length if self.length else 12)
         self.lenvar = \
             att.params.get('lenvar',
-                self.lenvar if self.lenvar != None else self.length / 4)
+                self.lenvar if self.lenvar != None else self.length // 4)
         assert self.length >= self.lenvar, "long enough string"
+        # repetitions of '_n' per length and length of '_n', see lenData
+        self.reps = {}
+        # salt for lenHash
+        prefix = self.prefix if isinstance(self.prefix, bytes) else \
+                 self.prefix.encode('utf-8')
+        self.salt = zlib.crc32(prefix) & 0xffffffff
     def lenData(self, length, n):
         sn = '_' + str(n)
-        s = self.prefix + sn * int(2 + (length - len(self.prefix)) / len(sn))
-        return s[:int(length)]
+        reps = self.reps.get((length, len(sn)))
+        if reps == None:
+            reps = int(2 + (length - len(self.prefix)) / len(sn))
+            self.reps[length, len(sn)] = reps
+        return (self.prefix + sn * reps)[:int(length)]
+    def lenHash(self, n):
+        # cheap hash of n, unlike hash() it does not change between runs
+        return ((n ^ self.salt) * 0x9E3779B97F4A7C15 & 0xFFFFFFFFFFFFFFFF) >> 32
     def baseData(self, n):
         # data dependent length so as to be deterministic
         s = self.lenData(self.length + self.lenvar, n)
-        length = self.length - self.lenvar + hash(s) % (2 * self.lenvar + 1) \
+        length = self.length - self.lenvar + \
+                 self.lenHash(n) % (2 * self.lenvar + 1) \
                  if self.lenvar != 0 else self.length
         return s[:int(length)]
-    def genData(self):
-        return self.baseData(IntGenerator.genData(self))
+    def mapData(self, n):
+        return self.baseData(n)
+    def mapBatch(self, ints):
+        # baseData on a list of integers
+        full, lenData = int(self.length + self.lenvar), self.lenData
+        if self.lenvar == 0:
+            return [lenData(full, n) for n in ints]
+        low, var, salt = int(self.length - self.lenvar), \
+                         int(2 * self.lenvar + 1), self.salt
+        m, k = 0xFFFFFFFFFFFFFFFF, 0x9E3779B97F4A7C15
+        return [lenData(full, n)[:low + (((n ^ salt) * k & m) >> 32) % var]
+                for n in ints]
 
 # two generators are needed, one for the chars & one for the words
 # the parameterized inherited generator is used for the words
 # BUG: unique is not checked nor structurally inforced
 class CharsGenerator(StringGenerator):
+    # words kept per vocabulary, others are built again when drawn
+    WORDS = 100000
     def __init__(self, att, chars):
         StringGenerator.__init__(self, att)
         if att.isUnique():
             raise Exception("chars generator does not support UNIQUE")
         self.chars = chars
-        macro = df_macro[att.params['cgen']] \
+        self.seed = att.schema.opts.seed
+        macro = att.schema.df_macro[att.params['cgen']] \
                 if 'cgen' in att.params else { 'gen':'uniform' }
         self.cgen = IntGenerator(att=None, params=macro)
+        self.cgen.mangle = self.mangle
+        # step & shift are drawn like those of the attribute
+        self.cgen.random = self.random
         self.cgen.setSize(len(chars)) # number of chars
         self.cgen.offset = 0
         # overwrite random
         self.cgen.random = random.Random()
+        # words per chars and char generator, shared between attributes
+        # of the schema, as they depend on its seed
+        self.vocabulary = att.schema.vocabularies.setdefault(
+            (chars, att.params.get('cgen'), self.cgen.step, self.cgen.shift), {})
     def lenData(self, length, n):
-        # be deterministic in n and depend on seed option
-        self.cgen.random.seed(opts.seed + str(n) if opts.seed else n)
-        s = ''.join([self.chars[self.cgen.getData()] for i in range(length)])
-        return s
+        # be deterministic in n and depend on seed option, so that
+        # the word is generated once, as long as ever needed
+        length = int(length)
+        s = self.vocabulary.get(n)
+        if s == None or len(s) < length:
+            self.cgen.random.seed(self.seed + str(n) if self.seed else n)
+            self.cgen.gens = 0
+            s = ''.join([self.chars[self.cgen.getData()]
+                         for i in range(length)])
+            if len(self.vocabulary) < CharsGenerator.WORDS or \
+               n in self.vocabulary:
+                self.vocabulary[n] = s
+        return s[:length]
+
+import os, mmap, array, struct
+
+def writeFile(path, write, mode=None):
+    # write a file with function write and rename it, so that concurrent
+    # runs see complete files
+    import tempfile
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+    f = os.fdopen(fd, 'wb')
+    try:
+        write(f)
+        f.close()
+        if mode != None:
+            os.chmod(tmp, mode)
+        os.rename(tmp, path)
+    except:
+        f.close()
+        os.remove(tmp)
+        raise
+
+# read-only list of the lines of a file, shared by path
+# lines are read from a memory mapping of the file, which is also shared
+# by forked processes, through an array of line ends saved next to the file
+class WordList:
+    lists = {}
+    @staticmethod
+    def stamp(path):
+        # size and time of a file, which head its index and its cache entry
+        stat = os.stat(path)
+        return struct.pack('<4sqd', b'DFW2', stat.st_size, stat.st_mtime)
+    @staticmethod
+    def get(path):
+        # a list is read again if its file changed
+        path = os.path.realpath(path)
+        if not path in WordList.lists or \
+           WordList.lists[path].header != WordList.stamp(path):
+            WordList.lists[path] = WordList(path)
+        return WordList.lists[path]
+    def __init__(self, path):
+        self.path, self.map = path, None
+        self.header = WordList.stamp(path)
+        size = struct.unpack('<4sqd', self.header)[1]
+        if size >= 2**32:
+            raise Exception("word file {0} is too large".format(path))
+        if size:
+            f = open(path, 'rb')
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            f.close()
+        if not self.loadEnds():
+            self.ends = self.findEnds()
+            self.saveEnds()
+    def findEnds(self):
+        # offsets of line ends, including a possible last unterminated line
+        ends, size = array.array('I'), len(self.map) if self.map else 0
+        if numpy != None and size:
+            ends.fromlist(numpy.flatnonzero(numpy.frombuffer(self.map,
+                          dtype=numpy.uint8) == 10).tolist())
+        else:
+            i = self.map.find(b'\n') if size else -1
+            while i != -1:
+                ends.append(i)
+                i = self.map.find(b'\n', i + 1)
+        if size and (not ends or ends[-1] != size - 1):
+            ends.append(size)
+        return ends
+    def loadEnds(self):
+        # false if the index is missing, stale or incomplete
+        try:
+            f = open(self.path + '.dfidx', 'rb')
+        except IOError:
+            return False
+        try:
+            header = f.read(len(self.header) + 8)
+            if header[:-8] != self.header:
+                return False
+            ends = array.array('I')
+            count = struct.unpack('<q', header[-8:])[0]
+            if os.fstat(f.fileno()).st_size != \
+               len(header) + count * ends.itemsize:
+                return False
+            ends.fromfile(f, count)
+        except EOFError:
+            return False
+        finally:
+            f.close()
+        # the last line ends with the file
+        size = len(self.map) if self.map else 0
+        if (ends[-1] if ends else -1) not in (size - 1, size):
+            return False
+        self.ends = ends
+        return True
+    def saveEnds(self):
+        # the index is just not kept if it cannot be written
+        def write(f):
+            f.write(self.header + struct.pack('<q', len(self.ends)))
+            self.ends.tofile(f)
+        try:
+            writeFile(self.path + '.dfidx', write, 0o644)
+        except (IOError, OSError):
+            pass
+    # for the model cache, only the path and its stamp are saved, as
+    # generators depend on the length of the list
+    def __getstate__(self):
+        return self.path, self.header
+    def __setstate__(self, state):
+        path, header = state
+        self.__dict__.update(WordList.get(path).__dict__)
+        if self.header != header:
+            raise Exception("word file {0} changed".format(path))
+    def __len__(self):
+        return len(self.ends)
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self.ends)
+        w = self.map[self.ends[i-1] + 1 if i else 0:self.ends[i]].rstrip()
+        return w if str is bytes else w.decode('utf-8')
+    def getBatch(self, ints):
+        # words for a list of non negative indexes
+        m, e = self.map, self.ends
+        ws = [m[e[i-1] + 1 if i else 0:e[i]].rstrip() for i in ints]
+        return ws if str is bytes else [w.decode('utf-8') for w in ws]
 
 class WordGenerator(StringGenerator):
     def __init__(self, att, spec, words=None):
@@ -1510,11 +2142,8 @@ class WordGenerator(StringGenerator):
         elif spec[0] == ':':
             self.words = spec[1:].split(',')
         else:
-            # load word list from file
-            f = open(spec)
-            assert f, "file {0} is opened".format(spec)
-            self.words = [l.rstrip() for l in f]
-            f.close()
+            # shared word list from file
+            self.words = WordList.get(spec)
         StringGenerator.__init__(self, att)
         # TODO: should check that UNIQUE is ok
         # overwrite default size from IntGenerator
@@ -1529,8 +2158,13 @@ class WordGenerator(StringGenerator):
             self.size = len(self.words)
         if self.offset + self.size > len(self.words):
             self.offset = 0
-    def genData(self):
-        return self.words[IntGenerator.genData(self)]
+    def mapData(self, n):
+        return self.words[n]
+    def mapBatch(self, ints):
+        words = self.words
+        if isinstance(words, WordList):
+            return words.getBatch(ints)
+        return [words[n] for n in ints]
 
 class TextGenerator(WordGenerator):
     def __init__(self, att, spec):
@@ -1547,20 +2181,60 @@ class TextGenerator(WordGenerator):
                 self.random.randrange(0, 2*self.lenvar+1) \
             if self.lenvar != 0 else self.length
         return ' '.join([WordGenerator.genData(self) for i in range(length)])
+    def genBatch(self, n):
+        # draw all lengths, then all words at once, and cut texts
+        low, high = self.length - self.lenvar, self.length + self.lenvar
+        if numpy != None:
+            lens = self.getNumpyRandom().randint(low, high + 1, n).tolist()
+        else:
+            lens = [self.random.randint(low, high) for i in range(n)]
+        words = self.mapBatch(self.intBatch(sum(lens)))
+        texts, i = [], 0
+        for l in lens:
+            texts.append(' '.join(words[i:i+l]))
+            i += l
+        return texts
+
+import binascii
 
 class BlobGenerator(Generator):
     def __init__(self, att, params=None):
         Generator.__init__(self, att, params)
         self.length = self.params.get('length', 12)
-        self.lenvar = self.params.get('lenvar', self.length / 4)
+        self.lenvar = self.params.get('lenvar', self.length // 4)
         assert self.length >= self.lenvar, "long enough blob"
+    def randomBytes(self, n):
+        # n random bytes drawn at once
+        if n == 0:
+            return b''
+        bits = self.random.getrandbits(8 * n)
+        if hasattr(bits, 'to_bytes'): # python 3
+            return bits.to_bytes(n, 'little')
+        return binascii.unhexlify('{0:0{1}x}'.format(bits, 2 * n))
     def genData(self):
         len = self.random.randint(self.length-self.lenvar,
                                   self.length+self.lenvar)
-        return db.blobValue(self.random.randrange(256) for o in range(len))
-
-# return a dictionnary from line
-def getParams(dfline):
+        return self.randomBytes(len)
+    def genBatch(self, n):
+        # draw all bytes at once, then cut blobs
+        if numpy != None:
+            r = self.getNumpyRandom()
+            lens = r.randint(self.length - self.lenvar,
+                             self.length + self.lenvar + 1, n).tolist()
+            data = r.randint(0, 256, sum(lens), dtype=numpy.uint8).tobytes()
+        else:
+            lens = [self.random.randint(self.length - self.lenvar,
+                                        self.length + self.lenvar)
+                    for i in range(n)]
+            data = self.randomBytes(sum(lens))
+        blobs, i = [], 0
+        for l in lens:
+            blobs.append(data[i:i+l])
+            i += l
+        return blobs
+
+# return a dictionnary from line, with macros for use
+def getParams(dfline, macros=None):
     if dfline == '':
         return {}
     params = {}
@@ -1586,9 +2260,9 @@ def getParams(dfline):
         if d:
             # handle use of a macro directly
             if d.group(1) == 'use':
-                assert d.group(2) in df_macro, \
+                assert macros != None and d.group(2) in macros, \
                     "macro {0} is defined".format(d.group(2))
-                params.update(df_macro[d.group(2)])
+                params.update(macros[d.group(2)])
             else:
                 params[d.group(1)] = d.group(2)
             dfline = d.group(3)
@@ -1604,11 +2278,12 @@ def getParams(dfline):
 #
 # Relation model
 #
+import hashlib
 class Model:
     # global parameters
     params = { 'size':int, 'offset':int, 'mangle':bool, 'null':float,
                'seed':str }
-    def __init__(self, name):
+    def __init__(self, name, schema=None):
         if name[0] == '"' or name[0] == '`':
             self.name = name[1:-1]
             self.quoted = True
@@ -1617,8 +2292,14 @@ class Model:
             self.quoted = False
         self.size = None
         self.params = {}
-    def setParams(self, dfline):
-        self.params.update(getParams(dfline))
+        # schema with options and database, set again on a cached model
+        self.schema = schema
+    def __getstate__(self):
+        d = self.__dict__.copy()
+        d['schema'] = None
+        return d
+    def setParams(self, dfline, macros=None):
+        self.params.update(getParams(dfline, macros))
         self.checkParams()
     def checkParams(self):
         params = self.__class__.params
@@ -1632,7 +2313,8 @@ class Model:
                                 format(k))
             # else everythin is fine
     def getName(self):
-        return db.quoteIdent(self.name) if self.quoted else self.name
+        return self.schema.db.quoteIdent(self.name) if self.quoted \
+               else self.name
 
 class Attribute(Model):
     # all attribute parameters and their types
@@ -1664,6 +2346,7 @@ class Attribute(Model):
         self.isPK = False
         self.unique = False
         self.not_null = False
+        self.table = None
         self.gen = None
     def __str__(self):
         return "Attr {0} {1} {2} PK={3} U={4} NN={5} FK=[{6}]". \
@@ -1674,6 +2357,18 @@ class Attribute(Model):
         if self.gen:
             return self.gen.getData()
         raise Exception("no generator set for attribute {0}".format(self.name))
+    def getBatch(self, n):
+        if self.gen:
+            profile = self.schema.profile
+            if profile != None:
+                start = time.time()
+                batch = self.gen.getBatch(n)
+                profile.add(('attribute', '{0}.{1} {2}'.format(
+                    self.table.name, self.name, self.gen.__class__.__name__)),
+                            start, n)
+                return batch
+            return self.gen.getBatch(n)
+        raise Exception("no generator set for attribute {0}".format(self.name))
     def checkParams(self):
         Model.checkParams(self)
         if 'cgen' in self.params and not 'chars' in self.params:
@@ -1690,20 +2385,165 @@ class Attribute(Model):
     def isNullable(self):
         return not self.not_null and not self.isPK
     def isSerial(self):
-        return db.serialType(self.type)
+        return self.schema.db.serialType(self.type)
+
+# set of unique keys, stored as 64-bit hashes in an open addressing table
+# if numpy is available. Integer keys of one attribute are mixed with a
+# bijection, so only the key hashed to the empty slot may collide. Other
+# keys are not kept, and a hash collision is seen as a duplicate key,
+# which only costs a retry.
+# Without numpy, keys are kept in a set, which compares them on hash hits.
+# Hashes are stable across processes, unlike hash() on strings with python 3.
+class UniqueIndex:
+    def __init__(self, chunk=10000):
+        # keys are moved by slices of chunk slots when growing
+        self.count, self.chunk = 0, max(1, chunk)
+        if numpy != None:
+            # 0 is the empty slot, keep the load factor under 1/2 by
+            # growing with the keys, as only part of a table may be generated
+            self.capacity = 16
+            self.table = numpy.zeros(self.capacity, dtype=numpy.int64)
+        else:
+            self.table = set()
+    def __len__(self):
+        return self.count
+    @staticmethod
+    def memory(size, width=1):
+        # approximate bytes used for size keys of width values, once grown
+        if numpy != None:
+            capacity = 16
+            while capacity < 2 * size:
+                capacity *= 2
+            # the previous table is kept while moving its keys
+            return 8 * capacity + (4 * capacity if capacity > 16 else 0)
+        # python set of tuples: 16 bytes per slot at a load factor
+        # up to 3/5, plus the tuples and their values
+        capacity = 8
+        while 3 * capacity < 5 * size:
+            capacity *= 2
+        return 16 * capacity + (48 + 40 * width) * size
+    @staticmethod
+    def mix(h):
+        # splitmix64 finalizer on uint64 arrays
+        h = (h ^ (h >> numpy.uint64(30))) * numpy.uint64(0xbf58476d1ce4e5b9)
+        h = (h ^ (h >> numpy.uint64(27))) * numpy.uint64(0x94d049bb133111eb)
+        return h ^ (h >> numpy.uint64(31))
+    @staticmethod
+    def hashValue(v):
+        s = repr(v)
+        if not isinstance(s, bytes):
+            s = s.encode('utf-8')
+        return struct.unpack('<Q', hashlib.md5(s).digest()[:8])[0]
+    @staticmethod
+    def mix1(h):
+        # same as mix on one python integer
+        m = 0xFFFFFFFFFFFFFFFF
+        h = ((h ^ (h >> 30)) * 0xbf58476d1ce4e5b9) & m
+        h = ((h ^ (h >> 27)) * 0x94d049bb133111eb) & m
+        return h ^ (h >> 31)
+    @staticmethod
+    def entry(nu, key, ints):
+        # the key itself without numpy, or the same as hashes for one key
+        if numpy == None:
+            return (nu,) + tuple(key)
+        m, h = 0xFFFFFFFFFFFFFFFF, nu
+        for x, isint in zip(key, ints):
+            v = x & m if isint else UniqueIndex.hashValue(x)
+            h = UniqueIndex.mix1((h * 0x100000001b3 & m) ^
+                                 UniqueIndex.mix1(v))
+        if h >= 0x8000000000000000:
+            h -= 0x10000000000000000
+        return h or 1
+    @staticmethod
+    def hashes(nu, cols, ints):
+        # numpy hashes of keys number nu from their columns, ints tells
+        # which columns hold integers without NULL, which are hashed faster
+        m = 0xFFFFFFFFFFFFFFFF
+        h = numpy.zeros(len(cols[0]), dtype=numpy.uint64) + numpy.uint64(nu)
+        for c, isint in zip(cols, ints):
+            v = numpy.array([x & m for x in c] if isint else
+                            [UniqueIndex.hashValue(x) for x in c],
+                            dtype=numpy.uint64)
+            h = UniqueIndex.mix(h * numpy.uint64(0x100000001b3) ^
+                                UniqueIndex.mix(v))
+        h = h.view(numpy.int64)
+        h[h == 0] = 1
+        return h
+    def slot(self, h):
+        # slot of hash h, or of the empty slot where it would go
+        mask = self.capacity - 1
+        i, t = h & mask, self.table
+        while t[i] != 0 and t[i] != h:
+            i = (i + 1) & mask
+        return i
+    def __contains__(self, h):
+        if numpy == None:
+            return h in self.table
+        return self.table[self.slot(h)] == h
+    def add(self, h):
+        if numpy == None:
+            self.table.add(h)
+        else:
+            if 2 * (self.count + 1) > self.capacity:
+                self.grow()
+            self.table[self.slot(h)] = h
+        self.count += 1
+    def lookup(self, hs):
+        # whether hashes are in the index
+        mask, found = self.capacity - 1, numpy.zeros(len(hs), dtype=bool)
+        slots, todo = hs & mask, numpy.arange(len(hs))
+        while todo.size:
+            v = self.table[slots[todo]]
+            hit, empty = v == hs[todo], v == 0
+            found[todo[hit]] = True
+            todo = todo[~(hit | empty)]
+            slots[todo] = (slots[todo] + 1) & mask
+        return found
+    def insert(self, hs):
+        # add distinct new hashes to the index
+        while 2 * (self.count + len(hs)) > self.capacity:
+            self.grow()
+        self.place(hs)
+        self.count += len(hs)
+    def place(self, hs):
+        # store hashes in free slots, the table is large enough
+        mask = self.capacity - 1
+        slots, todo = hs & mask, numpy.arange(len(hs))
+        while todo.size:
+            free = todo[self.table[slots[todo]] == 0]
+            # first hash wins among those wanting the same free slot
+            win = free[numpy.unique(slots[free], return_index=True)[1]]
+            self.table[slots[win]] = hs[win]
+            todo = numpy.setdiff1d(todo, win, assume_unique=True)
+            busy = todo[self.table[slots[todo]] != 0]
+            slots[busy] = (slots[busy] + 1) & mask
+    def grow(self):
+        # move keys by slices, so that temporary arrays stay small
+        old = self.table
+        self.capacity *= 2
+        self.table = numpy.zeros(self.capacity, dtype=numpy.int64)
+        for i in range(0, len(old), self.chunk):
+            hs = old[i:i+self.chunk]
+            self.place(hs[hs != 0])
 
 class Table(Model):
     params = { 'mult':float, 'size':int, 'nogen':bool,
-               'skip':float, 'null':float }
-    def __init__(self, name):
-        Model.__init__(self, name)
+               'skip':float, 'null':float, 'product':bool, 'nomangle':bool }
+    def __init__(self, name, schema=None):
+        Model.__init__(self, name, schema)
         self.params['mult'] = 1.0
         # attributes
         self.atts = {}
         self.att_list = [] # list of attributes in occurrence order
         self.unique = []
-        self.ustuff = {} # uniques are registered in this dictionnary
+        self.ustuff = None # uniques are registered in this index
+        self.product = [] # or enumerated with these parameters
+        self.gens = 0
         self.constraints = []
+        # whether tuples are being generated, as generators have a state
+        self.active = False
+        # random generator shared by the generators of the table
+        self.random = random.Random()
     def __str__(self):
         return "Table {0} ({1:d})".format(self.name, self.size)
     def __repr__(self):
@@ -1718,7 +2558,7 @@ class Table(Model):
         self.att_list.append(att)
         self.atts[att.name] = att
         # point back
-        att.table = self
+        att.table, att.schema = self, self.schema
         # pg-specific generated constraint names
         if att.isPK:
             self.constraints.append(self.name + '_pkey')
@@ -1738,32 +2578,147 @@ class Table(Model):
             if a.isPK:
                 return a
         raise Exception("no PK found in table {0}".format(self.name))
-    def getData(self):
-        tries = opts.tries
+    def initUnique(self):
+        if self.ustuff == None:
+            self.ustuff = UniqueIndex(self.schema.opts.chunk)
+            # integer attributes without NULL are hashed faster
+            atts = list(filter(lambda x: x.gen, self.att_list))
+            self.uints = [[atts[i-1].gen.__class__ is IntGenerator and
+                           atts[i-1].gen.nullp == 0.0 for i in u]
+                          for u in self.unique]
+    def checkBatch(self, cols):
+        # register unique keys of tuples if they are all new,
+        # return the numbers of the other tuples
+        n = len(cols[0])
+        if numpy == None:
+            return [i for i in range(n)
+                    if not self.checkUnique([c[i] for c in cols])]
+        self.initUnique()
+        nu, keys = 0, []
+        for u, ints in zip(self.unique, self.uints):
+            nu += 1
+            keys.append(UniqueIndex.hashes(nu, [cols[i-1] for i in u], ints))
+        # keep tuples with new keys which are first in the chunk
+        ok = numpy.ones(n, dtype=bool)
+        for hs in keys:
+            first = numpy.zeros(n, dtype=bool)
+            first[numpy.unique(hs, return_index=True)[1]] = True
+            ok &= first & ~self.ustuff.lookup(hs)
+        for hs in keys:
+            self.ustuff.insert(hs[ok])
+        return numpy.flatnonzero(~ok).tolist()
+    def checkUnique(self, tup):
+        # register unique keys of tuple if they are all new
+        self.initUnique()
+        nu, hl = 0, []
+        for u, ints in zip(self.unique, self.uints):
+            nu += 1
+            h = UniqueIndex.entry(nu, [tup[i-1] for i in u], ints)
+            if h in self.ustuff:
+                return False # non unique tuple
+            hl.append(h)
+        for h in hl:
+            self.ustuff.add(h)
+        return True
+    def setProduct(self):
+        # generate compound unique keys by enumerating the product
+        # of the sizes of their attributes, instead of checking them
+        numbers = [i for u in self.unique for i in u]
+        if len(numbers) != len(set(numbers)):
+            raise Exception("product on table {0} with overlapping keys".
+                            format(self.name))
+        atts = list(filter(lambda x: x.gen, self.att_list))
+        for u in self.unique:
+            gens = [atts[i-1].gen for i in u]
+            for g in gens:
+                if not isinstance(g, IntGenerator) or \
+                   isinstance(g, (CharsGenerator, TextGenerator)):
+                    raise Exception("product on table {0} requires "
+                                    "integer based generators".
+                                    format(self.name))
+            total = 1
+            for g in gens:
+                total *= g.size
+            if self.size > total:
+                raise Exception("product on table {0} of size {1:d} "
+                                "exceeds key product {2:d}".
+                                format(self.name, self.size, total))
+            # random affine permutation of key numbers
+            shift, step = 0, 1
+            if not 'nomangle' in self.params and total > 1:
+                shift, step = self.random.randrange(total), 0
+                while gcd(step, total) != 1:
+                    step = self.random.randrange(1, total)
+            self.product.append(([i-1 for i in u], gens, total, shift, step))
+        # keys are unique by construction
+        self.unique = []
+    def productBatch(self, cols, n):
+        # set key columns for tuples self.gens to self.gens+n-1
+        for cnums, gens, total, shift, step in self.product:
+            bases = [[] for g in gens]
+            for j in range(self.gens, self.gens + n):
+                # key number digits in mixed radix of attribute sizes
+                k = (shift + step * j) % total
+                for b, g in zip(bases, gens):
+                    k, d = divmod(k, g.size)
+                    b.append(d)
+            for c, g, b in zip(cnums, gens, bases):
+                cols[c] = g.baseBatch(b)
+    def getData(self, tries=None):
+        tries = self.schema.opts.tries if tries == None else tries
         while tries:
             tries -= 1
-            nu, collision = 0, False
-            sul= []
             l = [a.getData() for a in filter(lambda x: x.gen, self.att_list)]
-            for u in self.unique:
-                nu += 1
-                su = str(nu) + ':' + str([l[i-1] for i in u])
-                if su in self.ustuff:
-                    collision = True
-                    break # non unique tuple
-                else:
-                    sul.append(su)
-            if collision:
-                continue # restart while
-            else:
-                for su in sul:
-                    self.ustuff[su] = 1
+            if self.checkUnique(l):
                 return l
         raise Exception("cannot build tuple for table {0}".format(self.name))
+    def getBatch(self, n):
+        # generate n tuples column by column
+        profile = self.schema.profile
+        start = time.time() if profile != None else None
+        atts = list(filter(lambda x: x.gen, self.att_list))
+        keys = [c for p in self.product for c in p[0]]
+        cols = [None if i in keys else a.getBatch(n)
+                for i, a in enumerate(atts)]
+        if self.product:
+            self.productBatch(cols, n)
+        self.gens += n
+        if self.unique and n:
+            ustart = time.time() if profile != None else None
+            retries = self.checkBatch(cols)
+            for i in retries:
+                # first try failed, retry tuple by tuple
+                tup = self.getData(self.schema.opts.tries - 1)
+                for c, v in zip(cols, tup):
+                    c[i] = v
+            if profile != None:
+                profile.add(('unique', self.name), ustart, len(retries))
+        if profile != None:
+            profile.add(('table', self.name), start, n)
+        return cols
+    def seek(self, start):
+        # set random generation state for tuples from number start, so that
+        # any chunk of tuples is generated independently of previous ones
+        seed = self.schema.opts.seed
+        self.random.seed('{0}:{1}:{2}'.format(seed, self.name, start)
+                         if seed else None)
+        self.gens = start
+        for a in self.att_list:
+            if a.gen:
+                a.gen.seek(start)
+    def skipMask(self, n):
+        # whether to keep tuples
+        return [not self.random.random() < self.skip for i in range(n)]
 
 #
 # Databases
 #
+from decimal import Decimal
+from functools import partial
+try:
+    from shlex import quote
+except ImportError:
+    from pipes import quote # python 2
 
 class Database:
     def echo(self, s):
@@ -1778,6 +2733,14 @@ class Database:
         raise Exception('not implemented in abstract class')
     def insertValue(self, table, value, isLast):
         raise Exception('not implemented in abstract class')
+    def insertBatch(self, table, cols, isLast):
+        # one line per tuple from columns, isLast is about the last tuple
+        atts = filter(lambda x: x.gen, table.att_list)
+        cols = [self.formatValues(a, c) for a, c in zip(atts, cols)]
+        rows = list(zip(*cols))
+        last = len(rows) - 1
+        return '\n'.join([self.insertValue(table, v, isLast and i == last)
+                          for i, v in enumerate(rows)])
     def insertEnd(self):
         raise Exception('not implemented in abstract class')
     def setSequence(self, att, number):
@@ -1814,14 +2777,32 @@ class Database:
     def quoteLiteral(self, literal):
         return '\'' + literal + '\''
     # values
+    def formatter(self, att):
+        # return a function formatting native values generated for att
+        g = att.gen
+        return self.boolValue if isinstance(g, BoolGenerator) else \
+               self.dateValue if isinstance(g, DateGenerator) else \
+               (lambda t: self.timestampValue(t, g.tz)) \
+                   if isinstance(g, TimestampGenerator) else \
+               (lambda n: self.intervalValue(n, g.unit)) \
+                   if isinstance(g, IntervalGenerator) else \
+               self.blobValue if isinstance(g, BlobGenerator) else \
+               self.textValue if isinstance(g, StringGenerator) else \
+               str
+    def formatValues(self, att, values):
+        f, null = self.formatter(att), self.null()
+        return [null if v is None else f(v) for v in values]
     def null(self):
         raise Exception('not implemented in abstract class')
+    def textValue(self, s):
+        return s
     def boolValue(self, b):
         return 'TRUE' if b else 'FALSE'
+    # isoformat is much faster than strftime, and works before 1900
     def dateValue(self, d):
-        return d.strftime('%Y-%m-%d')
+        return d.isoformat()
     def timestampValue(self, t, tz=None):
-        ts = t.strftime('%Y-%m-%d %H:%M:%S')
+        ts = t.isoformat(' ')
         if tz:
             ts += ' ' + tz
         return ts
@@ -1842,14 +2823,18 @@ class PostgreSQL(Database):
              ','.join([a.getName() \
                        for a in filter(lambda x: x.gen, table.att_list)]))
     def insertValue(self, table, value, isLast):
-        return '\t'.join([self.boolValue(i) if type(i) is bool else str(i)
-                          for i in value])
+        return '\t'.join(value)
+    def insertBatch(self, table, cols, isLast):
+        # format column by column, then join tuples
+        atts = filter(lambda x: x.gen, table.att_list)
+        cols = [self.formatValues(a, c) for a, c in zip(atts, cols)]
+        return '\n'.join(['\t'.join(v) for v in zip(*cols)])
     def insertEnd(self):
         return '\\.'
     def setSequence(self, tab, att, number):
         name = "{0}_{1}_seq".format(tab.name, att.name)
         if tab.quoted or att.quoted:
-            name = db.quoteIdent(name)
+            name = self.quoteIdent(name)
         return "ALTER SEQUENCE {0} RESTART WITH {1};".format(name, number)
     def dropTable(self, table):
         return "DROP TABLE IF EXISTS {0};".format(table.getName())
@@ -1865,7 +2850,156 @@ class PostgreSQL(Database):
         t = type.lower()
         return Database.intType(self, t) or self.serialType(type)
     def blobValue(self, lo):
-        return r'\\x' + ''.join(["{:02x}".format(o) for o in lo])
+        x = binascii.hexlify(lo)
+        return r'\\x' + (x if str is bytes else x.decode('ascii'))
+    # binary COPY format
+    binary_header = b'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0)
+    binary_epoch = datetime(2000, 1, 1)
+    # interval units as (microseconds, days, months)
+    binary_units = {}
+    for units, value in [
+            (('s', 'sec', 'second', 'seconds'), (1000000, 0, 0)),
+            (('m', 'min', 'minute', 'minutes'), (60000000, 0, 0)),
+            (('h', 'hour', 'hours'), (3600000000, 0, 0)),
+            (('d', 'day', 'days'), (0, 1, 0)),
+            (('w', 'week', 'weeks'), (0, 7, 0)),
+            (('mon', 'mons', 'month', 'months'), (0, 0, 1)),
+            (('y', 'year', 'years'), (0, 0, 12))]:
+        for unit in units:
+            binary_units[unit] = value
+    def binaryCopy(self, table, filename, program=None):
+        # compressed files are read from the output of program, run by
+        # the shell
+        return "\\copy {0} ({1}) FROM {2}{3} WITH (FORMAT binary)". \
+            format(table.getName(),
+                   ','.join([a.getName() \
+                             for a in filter(lambda x: x.gen, table.att_list)]),
+                   'PROGRAM ' if program else '',
+                   self.quoteLiteral((program + ' ' + quote(filename)
+                                      if program else filename).
+                                     replace("'", "''")))
+    def binaryBegin(self):
+        return PostgreSQL.binary_header
+    def binaryBatch(self, table, cols):
+        # encode column by column, then join tuples with their field count
+        atts = list(filter(lambda x: x.gen, table.att_list))
+        null = struct.pack('!i', -1)
+        bcols = []
+        for a, c in zip(atts, cols):
+            f = self.binaryValue(a)
+            bcols.append([null if v is None else f(v) for v in c])
+        count = struct.pack('!h', len(atts))
+        return b''.join([count + b''.join(v) for v in zip(*bcols)])
+    def binaryEnd(self):
+        return struct.pack('!h', -1)
+    def binaryValue(self, att):
+        # return a function encoding a native value of att with its length,
+        # values of forced generators are converted from their text format
+        def fixed(fmt):
+            s = struct.Struct('!i' + fmt)
+            return partial(s.pack, s.size - 4)
+        length = struct.Struct('!i').pack
+        def text(v):
+            if not isinstance(v, bytes):
+                v = (v if isinstance(v, type(u'')) else str(v)).encode('utf-8')
+            return length(len(v)) + v
+        def convert(enc, native, conv):
+            return enc if native else lambda v: enc(conv(fmt(v)))
+        t, g, fmt = att.type, att.gen, self.formatter(att)
+        if re.match(r'(smallint|int2|smallserial|serial2)$', t):
+            return convert(fixed('h'), g.__class__ is IntGenerator, int)
+        elif re.match(r'(int|integer|int4|serial|serial4)$', t):
+            return convert(fixed('i'), g.__class__ is IntGenerator, int)
+        elif re.match(r'(bigint|int8|bigserial|serial8)$', t):
+            return convert(fixed('q'), g.__class__ is IntGenerator, int)
+        elif re.match(r'(real|float4)$', t):
+            return convert(fixed('f'), g.__class__ is FloatGenerator, float)
+        elif re.match(r'(float|float8|double\s+precision)$', t):
+            return convert(fixed('d'), g.__class__ is FloatGenerator, float)
+        elif re.match(r'(numeric|decimal)$', t):
+            return lambda v: self.binaryNumeric(fmt(v))
+        elif self.boolType(t):
+            enc = lambda b: struct.pack('!ib', 1, b)
+            return convert(enc, isinstance(g, BoolGenerator),
+                lambda s: s.upper() in ('TRUE', 'T', 'YES', 'Y', 'ON', '1'))
+        elif self.dateType(t):
+            days, epoch = fixed('i'), PostgreSQL.binary_epoch.toordinal()
+            enc = lambda d: days(d.toordinal() - epoch)
+            return convert(enc, isinstance(g, DateGenerator),
+                           DateGenerator.parse)
+        elif self.timestampType(t):
+            # timestamps with time zone are sent as UTC
+            offset = 0
+            if isinstance(g, TimestampGenerator) and g.tz and 'with' in t:
+                offset = self.binaryOffset(g.tz)
+            usecs, epoch = fixed('q'), PostgreSQL.binary_epoch
+            def enc(ts):
+                d = ts - epoch
+                return usecs((d.days * 86400 + d.seconds - offset) * 1000000 +
+                             d.microseconds)
+            return convert(enc, isinstance(g, TimestampGenerator),
+                           lambda s: TimestampGenerator.parse(s[:19]))
+        elif self.intervalType(t):
+            s = struct.Struct('!iqii')
+            def interval(n, unit):
+                if not unit in PostgreSQL.binary_units:
+                    raise Exception("unexpected unit {0} for binary format".
+                                    format(unit))
+                u, d, m = PostgreSQL.binary_units[unit]
+                return s.pack(16, u * n, d * n, m * n)
+            if isinstance(g, IntervalGenerator):
+                return lambda n: interval(n, g.unit)
+            def parse(s):
+                i = re.match(r'\s*(-?\d+)\s*([a-z]+)\s*$', s, re.I)
+                if not i:
+                    raise Exception("unexpected interval {0}".format(s))
+                return interval(int(i.group(1)), i.group(2).lower())
+            return lambda v: parse(fmt(v))
+        elif self.blobType(t) and isinstance(g, BlobGenerator):
+            return lambda b: struct.pack('!i', len(b)) + bytes(b)
+        elif isinstance(g, StringGenerator):
+            return text
+        else: # text types, enums, or blob from other generators
+            return lambda v: text(fmt(v))
+    def binaryOffset(self, tz):
+        # seconds east of UTC for a numerical time zone such as +02 or -05:30
+        if tz.upper() == 'UTC' or tz.upper() == 'GMT':
+            return 0
+        o = re.match(r'([+-])(\d\d?)(:?(\d\d))?$', tz)
+        if not o:
+            raise Exception("binary format requires numerical time zones, "
+                            "got {0}".format(tz))
+        offset = 3600 * int(o.group(2)) + 60 * int(o.group(4) or 0)
+        return offset if o.group(1) == '+' else -offset
+    def binaryNumeric(self, s):
+        # base 10000 digits, see src/backend/utils/adt/numeric.c
+        sign, digits, exp = Decimal(s).as_tuple()
+        if exp == 'n' or exp == 'N':
+            return struct.pack('!ihhhh', 8, 0, 0, 0xC000 - 0x10000, 0)
+        if exp == 'F': # infinity, for PostgreSQL 14 and later
+            return struct.pack('!ihhhh', 8, 0, 0,
+                               (0xF000 if sign else 0xD000) - 0x10000, 0)
+        digits = ''.join([str(d) for d in digits])
+        dscale = max(0, -exp)
+        # align digits on the decimal point, by groups of 4
+        if exp > 0:
+            digits += '0' * exp
+        digits += '0' * ((4 - dscale % 4) % 4)
+        ndec = len(digits) - (dscale + 3) // 4 * 4
+        digits = '0' * ((4 - ndec % 4) % 4) + digits
+        weight = (ndec + 3) // 4 - 1
+        groups = [int(digits[i:i+4]) for i in range(0, len(digits), 4)]
+        # remove leading and trailing zero groups
+        while groups and groups[0] == 0:
+            groups.pop(0)
+            weight -= 1
+        while groups and groups[-1] == 0:
+            groups.pop()
+        if not groups:
+            sign, weight = 0, 0
+        return struct.pack('!ihhhh' + 'h' * len(groups), 8 + 2 * len(groups),
+                           len(groups), weight, 0x4000 if sign else 0,
+                           dscale, *groups)
 
 class MySQL(Database):
     def begin(self):
@@ -1876,11 +3010,7 @@ class MySQL(Database):
         return "INSERT INTO {0} ({1}) VALUES".format(table.getName(),
                         ','.join([a.getName() for a in table.att_list]))
     def insertValue(self, table, value, isLast):
-        qv = []
-        for v in value:
-            qv.append(self.boolValue(v) if type(v) is bool else
-                      self.quoteLiteral(v) if type(v) is str else str(v))
-        s = '  (' + ','.join([str(v) for v in qv]) + ')'
+        s = '  (' + ','.join(value) + ')'
         if not isLast:
             s += ','
         return s
@@ -1888,6 +3018,14 @@ class MySQL(Database):
         return ';'
     def null(self):
         return 'NULL'
+    def textValue(self, s):
+        return self.quoteLiteral(s)
+    def dateValue(self, d):
+        return self.quoteLiteral(Database.dateValue(self, d))
+    def timestampValue(self, t, tz=None):
+        return self.quoteLiteral(Database.timestampValue(self, t, tz))
+    def intervalValue(self, val, unit):
+        return self.quoteLiteral(Database.intervalValue(self, val, unit))
     def intType(self, type):
         t = type.lower()
         return Database.intType(self, t) or t == 'tinyint' or t == 'mediumint'
@@ -1895,171 +3033,253 @@ class MySQL(Database):
 # class SQLite(Database):
 # class CSV(Database):
 
-# option management
-# --size=1000
-# --target=postgresql|mysql
-# --help is automatic
-import sys
-import argparse
-opts = argparse.ArgumentParser(version="version {0}".format(version),
-                    description='Fill database tables with random data.')
-opts.add_argument('-s', '--size', type=int, default=None,
-                  help='scale to size')
-opts.add_argument('-t', '--target', default='postgresql',
-                  help='generate for this engine')
-opts.add_argument('-f', '--filter', action='store_true', default=False,
-                  help='also include input in output')
-opts.add_argument('-T', '--transaction', action='store_true',
-                  help='wrap output in a transaction')
-opts.add_argument('-S', '--seed', default=None,
-                  help='random generator seed')
-opts.add_argument('-O', '--offset', type=int, default=None,
-                  help='set global offset for integer primary keys')
-opts.add_argument('-M', '--mangle', action='store_true', default=False,
-                  help='use a random step for integer generation')
-opts.add_argument('--truncate', action='store_true', default=False,
-                  help='truncate table contents before loading')
-opts.add_argument('--drop', action='store_true', default=False,
-                  help='drop tables before reloading')
-opts.add_argument('-D', '--debug', action='count',
-                  help='set debug mode')
-opts.add_argument('-m', '--man', action='store_const', const=2,
-                  help='show man page')
-opts.add_argument('-n', '--null', type=float, default=None,
-                  help='probability of generating a NULL value')
-opts.add_argument('--pod', type=str, default='pod2usage -verbose 3',
-                  help='override pod2usage command')
-opts.add_argument('--test', default=None,
-                  help='show output for an example')
-opts.add_argument('--validate', action='store_true', default=False,
-                  help='shortcut for script validation')
-opts.add_argument('--tries', type=int, default=10,
-                  help='how hard to try to satisfy unique constraints')
-opts.add_argument('-V', action='store_true', default=False,
-                  help='show short version on stdout')
-opts.add_argument('file', nargs='*',
-                  help='process files, or stdin if empty')
-opts = opts.parse_args()
-
-if opts.V:
-    print(VERSION)
-    sys.exit(0)
-
-# set database
-db = None
-if opts.target == 'postgresql':
-    db = PostgreSQL()
-elif opts.target == 'mysql':
-    db = MySQL()
-else:
-    raise Exception("unexpected target database {0}".format(opts.target))
+#
+# Output
+#
+import shutil, io, codecs
 
-# shortcut
-if opts.validate:
-    opts.test = 'validate'
-    opts.transaction = True
+class Output:
+    # accumulate output as bytes, written when buffer is full
+    def __init__(self, file, size):
+        self.file = file
+        self.size = size
+        self.buffer, self.length = [], 0
+        # bytes written so far
+        self.total = 0
+        # text files are written strings
+        self.text = isinstance(file, io.TextIOBase)
+    def write(self, s):
+        if not isinstance(s, bytes):
+            s = s.encode('utf-8')
+        self.buffer.append(s)
+        self.length += len(s)
+        self.total += len(s)
+        if self.length >= self.size:
+            self.flush()
+    def writeln(self, s):
+        self.write(s)
+        self.write('\n')
+    def flush(self):
+        data = b''.join(self.buffer)
+        self.file.write(data.decode('utf-8') if self.text else data)
+        self.buffer, self.length = [], 0
+    def copy(self, f):
+        # append contents of file f
+        self.flush()
+        shutil.copyfileobj(codecs.getreader('utf-8')(f) if self.text else f,
+                           self.file)
+    def close(self):
+        self.flush()
+        self.file.flush()
 
-# int & bool generator tests
-test = re.match(r'(\w+):\s*(.*)', opts.test if opts.test else '')
-if test:
-    ttype, params = test.group(1), getParams(test.group(2))
-    if ttype == 'bool':
-        gen = BoolGenerator(None, params)
-        val, n = [ 0, 0 ], 10000
-        for i in range(n):
-            val[gen.genData()] += 1
-        print("True: {:5.2f} %".format(100.0*val[1]/n))
-    elif ttype == 'int':
-        gen = IntGenerator(None, params)
-        gen.offset = 0
-        gen.setSize(params.get('size', opts.size if opts.size else 10))
-        val, n = [ 0 ] * gen.size, 1000 * gen.size
-        for i in range(n):
-            val[gen.genData()] += 1
-        for i in range(gen.size):
-            print("{:4d}  {:5.2f} %".format(i, 100.0*val[i]/n))
-    elif ttype == 'float':
-        gen = FloatGenerator(None, params)
-        size = opts.size if opts.size else 10
-        print(sorted([gen.genData() for i in range(size)]))
-    elif ttype == 'blob':
-        gen = BlobGenerator(None, params)
-        for i in range(opts.size if opts.size else 10):
-            print(gen.genData())
+#
+# COMPRESSION
+#
+# blocks are compressed independently in threads, as gzip members,
+# xz streams or zstd frames, which decompress as one stream when
+# concatenated. zlib, lzma and zstandard release the GIL.
+
+# method: default, lowest and highest levels, file suffix,
+# decompression command
+COMPRESS = {
+    'gzip': (6, 0, 9, '.gz', 'gzip -dc'),
+    'lzma': (6, 0, 9, '.xz', 'xz -dc'),
+    'zstd': (3, 1, 22, '.zst', 'zstd -dc'),
+}
+
+def compressBlock(method, level, data):
+    if method == 'gzip':
+        z = zlib.compressobj(level, zlib.DEFLATED, 31)
+        return z.compress(data) + z.flush()
+    elif method == 'lzma':
+        import lzma
+        return lzma.compress(data, preset=level)
     else:
-        raise Exception("unexpected generator test {0}".format(ttype))
-    sys.exit(0)
-
-# option consistency
-if opts.drop or opts.test:
-    opts.filter = True
-
-if opts.filter and opts.truncate:
-    raise Exception("option truncate does not make sense with option filter")
-
-if opts.man:
-    # hack to have pod from python
-    import os, tempfile
-    pod = tempfile.NamedTemporaryFile(mode='w')
-    pod.write(POD.format(comics=COMICS, pgbench=PGBENCH,
-                         script=sys.argv[0], version=version))
-    pod.flush()
-    os.system(opts.pod + ' ' + pod.name)
-    pod.close()
-    sys.exit(0)
-
-# reset arguments for fileinput
-sys.argv[1:] = opts.file
+        import zstandard
+        return zstandard.ZstdCompressor(level=level).compress(data)
+
+class Compressor:
+    # bytes file which writes blocks of size bytes compressed in threads,
+    # in order. close() stops the threads, but not the underlying file.
+    # The processors are shared by jobs processes which may compress.
+    def __init__(self, file, method, level, size, jobs=1):
+        import multiprocessing
+        self.file, self.method, self.size = file, method, size
+        self.level = COMPRESS[method][0] if level == None else level
+        self.threads = max(1, multiprocessing.cpu_count() // jobs)
+        # threads are started by the first block, in the writing process
+        self.pool = None
+        self.buffer, self.length = [], 0
+        # compressed blocks to write, oldest first
+        self.pending = []
+    def write(self, data):
+        self.buffer.append(data)
+        self.length += len(data)
+        if self.length >= self.size:
+            self.submit()
+    def submit(self):
+        if self.length:
+            if self.pool == None:
+                import multiprocessing.pool
+                self.pool = multiprocessing.pool.ThreadPool(self.threads)
+            self.pending.append(self.pool.apply_async(compressBlock,
+                (self.method, self.level, b''.join(self.buffer))))
+            self.buffer, self.length = [], 0
+        # keep a few blocks per thread in memory
+        while len(self.pending) > 2 * self.threads:
+            self.file.write(self.pending.pop(0).get())
+    def flush(self):
+        self.submit()
+        while self.pending:
+            self.file.write(self.pending.pop(0).get())
+        self.file.flush()
+    def close(self):
+        self.flush()
+        if self.pool != None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+    def abort(self):
+        # stop the threads, without writing pending blocks
+        if self.pool != None:
+            self.pool.terminate()
+            self.pool = None
+        self.buffer, self.length, self.pending = [], 0, []
 
 #
-# global variables while parsing
+# MODEL CACHE
 #
-
-# list of tables in occurrence order, for regeneration
-tables = []
-all_tables = {}
-
-# parser status
-current_table = None
-current_attribute = None
-current_enum = None
-dfstuff = None
-att_number = 0
-
-# enums
-all_enums = {}
-re_enums = ''
-
-# schema stores global parameters
-schema = Model('df')
-
-# macros: 'name':{}
-df_macro = {}
-df_macro['cfr'] = getParams('gen=scale rate=0.17')
-df_macro['french'] = getParams('chars=\'esaitnrulodcpmvqfbghjxyzwk\' cgen=cfr')
-df_macro['cen'] = getParams('gen=scale rate=0.15')
-df_macro['english'] = getParams('chars=\'etaonrishdlfcmugypwbvkjxqz\' cgen=cen')
+# the parsed model with its generators is saved in the cache directory,
+# under a hash of the version, input and options which change the model
+import time
+import gc
+try:
+    import cPickle as pickle # python 2
+except ImportError:
+    import pickle
+
+# options which do not change the model
+OUTPUT_OPTIONS = ('cache', 'output', 'buffer', 'directory', 'jobs',
+                  'shard', 'chunk', 'format', 'debug', 'file',
+                  'profile', 'pstats', 'progress', 'plan', 'target_bytes',
+                  'compress', 'level')
+
+def modelKey(opts, lines):
+    # classes are pickled under the module name, script or library
+    h = hashlib.sha1('{0} {1}'.format(__name__, version).encode('utf-8'))
+    for k, v in sorted(vars(opts).items()):
+        if not k in OUTPUT_OPTIONS:
+            h.update(repr((k, v)).encode('utf-8'))
+    for l in lines:
+        h.update(l if isinstance(l, bytes) else l.encode('utf-8'))
+    return h.hexdigest()
+
+def loadModel(cache):
+    # None if the model is not found or cannot be loaded
+    try:
+        f = open(cache, 'rb')
+    except IOError:
+        return None
+    # garbage collection is useless and very slow on so many new objects
+    gc.disable()
+    try:
+        return pickle.load(f)
+    except Exception as e:
+        sys.stderr.write("ignoring cache {0}: {1}\n".format(cache, e))
+        return None
+    finally:
+        gc.enable()
+        f.close()
+
+def saveModel(cache, model):
+    directory = os.path.dirname(cache)
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        writeFile(cache, lambda f: pickle.dump(model, f, 2))
+    except Exception as e:
+        sys.stderr.write("cannot save cache {0}: {1}\n".format(cache, e))
 
 #
-# INPUT SCHEMA
+# PROFILE
 #
+class Profile:
+    # wall time, calls and rows per (kind, name)
+    def __init__(self):
+        self.stats = {}
+    def add(self, key, start, rows):
+        stats = self.stats.setdefault(key, [0.0, 0, 0])
+        stats[0] += time.time() - start
+        stats[1] += 1
+        stats[2] += rows
+    def merge(self, stats):
+        # add statistics from another process
+        for key, (delay, calls, rows) in stats.items():
+            s = self.stats.setdefault(key, [0.0, 0, 0])
+            s[0] += delay
+            s[1] += calls
+            s[2] += rows
+    def report(self, file):
+        # slowest first
+        file.write("-- profile: seconds calls rows kind name\n")
+        for key, (delay, calls, rows) in \
+                sorted(self.stats.items(), key=lambda i: -i[1][0]):
+            file.write("{0:10.3f} {1:8d} {2:10d}  {3} {4}\n".
+                       format(delay, calls, rows, key[0], key[1]))
 
-if opts.test == 'comics':
-    lines = StringIO(COMICS).readlines()
-elif opts.test == 'pgbench':
-    lines = StringIO(PGBENCH).readlines()
-elif opts.test == 'validate':
-    lines = StringIO(VALIDATE).readlines()
-else:
-    import fileinput # despite the name this is really a filter...
-    lines = [l for l in fileinput.input()]
+#
+# PROGRESS
+#
+def eta(rows, rate):
+    # remaining time for rows at rate rows per second
+    return str(timedelta(seconds=int(rows / rate))) if rate else '?'
+
+class Progress:
+    # report generated rows on stderr every interval seconds
+    def __init__(self, interval, total, done=None):
+        self.interval, self.total = interval, total
+        # rows of the run, possibly shared between processes
+        self.done, self.rows = done, 0
+        self.start = time.time()
+    def add(self, n):
+        # count n more rows, return the rows of the run
+        if self.done == None:
+            self.rows += n
+            return self.rows
+        with self.done.get_lock():
+            self.done.value += n
+            return int(self.done.value)
+    def begin(self, t, first, last, out):
+        # tuples first..last-1 of table t are generated into out
+        self.table, self.first, self.last, self.out = t, first, last, out
+        self.tstart, self.tdone, self.tbytes = time.time(), 0, out.total
+        self.next, self.reported = self.tstart + self.interval, None
+    def update(self, end=False):
+        # called after each chunk, so that the clock is not read per tuple
+        done = max(0, min(self.table.gens, self.last) - self.first)
+        run = self.add(done - self.tdone)
+        self.tdone = done
+        now = time.time()
+        # the end is not reported again if the last chunk just was
+        if end and done != self.reported or not end and now >= self.next:
+            self.next, self.reported = now + self.interval, done
+            self.report(now, run)
+    def report(self, now, run):
+        size = self.last - self.first
+        rate = self.tdone / max(now - self.tstart, 1e-6)
+        rrate = run / max(now - self.start, 1e-6)
+        sys.stderr.write("progress: table {0} {1}/{2} rows {3:.0f} rows/s "
+                         "{4:.1f} MB ETA {5}, run {6}/{7} rows ETA {8}\n".
+                         format(self.table.name, self.tdone, size, rate,
+                                (self.out.total - self.tbytes) / 1e6,
+                                eta(size - self.tdone, rate),
+                                run, self.total, eta(self.total - run, rrate)))
 
 #
 # SCHEMA PARSER
 #
 
 # extract a list of sql strings
-re_quoted = re.compile(r"[^']*'(([^']|'')*)'(.*)")
 def sql_string_list(line):
     sl = []
     quoted = re_quoted.match(line)
@@ -2069,299 +3289,1108 @@ def sql_string_list(line):
         quoted = re_quoted.match(line)
     return sl
 
-for line in lines:
-    if opts.debug:
-        sys.stderr.write("line=" + line)
-    # skip \commands
-    if backslash.match(line):
-        continue
-    # get datafiller stuff
-    d = df_dir.match(line)
-    if d:
-        dfstuff = d.group(1)
-    # get datafiller macro definition
-    d = df_mac.match(line)
-    if d:
-        if d.group(1) in df_macro:
-            sys.stderr.write("warning: macro {0} is redefined\n".
-                             format(d.group(1)))
-        df_macro[d.group(1)] = getParams(d.group(2))
-    # cleanup comments
-    c = comments.match(line)
-    if c:
-        line = c.group(1)
-    # reset current object
-    if new_object.match(line):
+class Schema:
+    # tables of a schema with their generators
+    def __init__(self, opts, db):
+        self.opts, self.db = opts, db
+        # list of tables in occurrence order, for regeneration
+        self.tables = []
+        self.all_tables = {}
+        # enums
+        self.all_enums = {}
+        # global parameters
+        self.df = Model('df')
+        # macros: 'name':{}
+        self.df_macro = {}
+        # words of chars generators
+        self.vocabularies = {}
+        # input lines, if kept, and initial options
+        self.lines = None
+        self.options = dict(vars(opts))
+        # time spent generating and formatting data
+        self.profile = Profile() if opts.profile else None
+        self.progress = None
+        # random generator for setting up generators
+        self.random = random.Random()
+        compileParser()
+        loadNumpy()
+        self.df_macro['cfr'] = getParams('gen=scale rate=0.17')
+        self.df_macro['french'] = \
+            getParams('chars=\'esaitnrulodcpmvqfbghjxyzwk\' cgen=cfr')
+        self.df_macro['cen'] = getParams('gen=scale rate=0.15')
+        self.df_macro['english'] = \
+            getParams('chars=\'etaonrishdlfcmugypwbvkjxqz\' cgen=cen')
+    def getModel(self):
+        return self.tables, self.all_tables, self.all_enums, self.df, \
+               self.df_macro
+    def setModel(self, model):
+        self.tables, self.all_tables, self.all_enums, self.df, \
+            self.df_macro = model
+        # the schema is not saved with the model
+        for t in self.tables:
+            t.schema = self
+            for a in t.att_list:
+                a.schema = self
+    def getTable(self, name):
+        return self.all_tables[name.lower()]
+    def begin(self, t):
+        # generators have a state, so a table is generated once at a time
+        if t.active:
+            raise Exception("table {0} is already being generated".
+                            format(t.name))
+        t.active = True
+    def parse(self, input):
+        # parser status
         current_table = None
         current_attribute = None
         current_enum = None
+        dfstuff = None
         att_number = 0
-    #
-    # CREATE TYPE ... AS ENUM
-    #
-    is_ce = create_enum.match(line)
-    if is_ce:
-        current_enum = is_ce.group(1) # lower()?
-        if re_enums:
-            re_enums += '|'
-        # ??? should escape special characters such as "."
-        re_enums += current_enum
-        all_enums[current_enum] = sql_string_list(line)
-        continue
-    # follow up...
-    if current_enum:
-        all_enums[current_enum].extend(sql_string_list(line))
-        continue
-    #
-    # CREATE TABLE
-    #
-    is_ct = create_table.match(line)
-    if is_ct:
-        name = is_ct.group(1)
-        current_table = Table(name)
-        tables.append(current_table)
-        all_tables[name.lower()] = current_table
-    elif current_table!=None:
+        tables, all_tables, all_enums = \
+            self.tables, self.all_tables, self.all_enums
+        for line in input:
+            if self.lines != None:
+                self.lines.append(line)
+            if self.opts.debug:
+                sys.stderr.write("line=" + line)
+            # skip empty lines and \commands
+            if line.isspace() or backslash.match(line):
+                continue
+            if '--' in line:
+                # get datafiller stuff
+                d = df_dir.match(line)
+                if d:
+                    dfstuff = d.group(1)
+                # get datafiller macro definition
+                d = df_mac.match(line)
+                if d:
+                    if d.group(1) in self.df_macro:
+                        sys.stderr.write("warning: macro {0} is redefined\n".
+                                         format(d.group(1)))
+                    self.df_macro[d.group(1)] = \
+                        getParams(d.group(2), self.df_macro)
+                # cleanup comments
+                c = comments.match(line)
+                if c:
+                    line = c.group(1)
+            # reset current object
+            is_ce, is_ct = None, None
+            if new_object.match(line):
+                current_table = None
+                current_attribute = None
+                current_enum = None
+                att_number = 0
+                # CREATE commands are new objects
+                is_ce = create_enum.match(line)
+                is_ct = not is_ce and create_table.match(line)
+            #
+            # CREATE TYPE ... AS ENUM
+            #
+            if is_ce:
+                current_enum = is_ce.group(1) # lower()?
+                all_enums[current_enum] = sql_string_list(line)
+                continue
+            # follow up...
+            if current_enum:
+                all_enums[current_enum].extend(sql_string_list(line))
+                continue
+            #
+            # CREATE TABLE
+            #
+            if is_ct:
+                name = is_ct.group(1)
+                current_table = Table(name, self)
+                tables.append(current_table)
+                all_tables[name.lower()] = current_table
+            elif current_table!=None:
+                #
+                # COLUMN
+                #
+                is_enum = False
+                c = column.match(line)
+                if not c and all_enums:
+                    c = column_other.match(line)
+                    is_enum = bool(c) and c.group(2) in all_enums
+                    if not is_enum:
+                        c = None
+                if c:
+                    att_number += 1
+                    current_attribute = \
+                        Attribute(c.group(1), att_number, c.group(2))
+                    current_attribute.is_enum = is_enum
+                    cons = set(k[0].upper() for k in constraint.findall(line))
+                    if 'P' in cons:
+                        current_attribute.isPK = True
+                    if 'U' in cons:
+                        current_attribute.unique = True
+                    if 'N' in cons:
+                        current_attribute.not_null = True
+                    current_table.addAttribute(current_attribute)
+                    r = 'R' in cons and reference.search(line)
+                    if r:
+                        target = r.group(1)
+                        current_attribute.FK = all_tables[target.lower()]
+                        current_attribute.FKatt = \
+                            r.group(5) if r.group(4) else None
+                else:
+                    # UNIQUE()
+                    u = unicity.match(line)
+                    if u:
+                        current_table.addUnique(re.split(r'[\s,]+',
+                                                         u.group(2)),
+                                                u.group(1))
+            # attribute df stuff to current object: schema, table or attribute
+            # this come last if the dfstuff is on the same line as its object
+            if dfstuff!=None:
+                if current_attribute!=None:
+                    current_attribute.setParams(dfstuff, self.df_macro)
+                elif current_table!=None:
+                    current_table.setParams(dfstuff, self.df_macro)
+                else:
+                    self.df.setParams(dfstuff, self.df_macro)
+                dfstuff = None
+    def setDefaults(self):
+        # set default values for some options, possibly from directives
+        opts, params = self.opts, self.df.params
+        if opts.size == None:
+            opts.size = params.get('size', 100)
+        if not opts.offset:
+            opts.offset = params.get('offset')
+        if not opts.mangle:
+            opts.mangle = 'mangle' in params
+        if not opts.null:
+            opts.null = params.get('null', 0.01)
+        if not opts.seed:
+            opts.seed = params.get('seed')
+        # otherwise shards would not generate parts of the same data
+        if opts.shard and not opts.seed:
+            raise Exception("option shard requires a seed, from option "
+                            "seed or directive seed")
+    def setup(self):
+        opts, db = self.opts, self.db
         #
-        # COLUMN
+        # SET TABLE AND ATTRIBUTE SIZES
         #
-        is_enum = False
-        c = column.match(line)
-        if not c and re_enums:
-            r = r'\s*,?\s*({0})\s+({1})'.format(re_ident, re_enums)
-            c = re.match(r, line)
-            is_enum = bool(c)
-        if c:
-            att_number += 1
-            current_attribute = Attribute(c.group(1), att_number, c.group(2))
-            current_attribute.is_enum = is_enum
-            if primary_key.match(line):
-                current_attribute.isPK = True
-            if unique.match(line):
-                current_attribute.unique = True
-            if not_null.match(line):
-                current_attribute.not_null = True
-            current_table.addAttribute(current_attribute)
-            r = reference.match(line)
-            if r:
-                target = r.group(1)
-                current_attribute.FK = all_tables[target.lower()]
-                current_attribute.FKatt = r.group(5) if r.group(4) else None
+        # first table sizes
+        for t in self.tables:
+            # set skip
+            t.skip = t.params['skip'] if 'skip' in t.params else 0.0
+            assert t.skip >= 0.0 and t.skip <= 1.0
+            if t.size==None:
+                t.size = t.params['size'] if 'size' in t.params else \
+                         int(t.params['mult'] * opts.size)
+        # *then* set att sizes and possible offset
+        for t in self.tables:
+            for a in t.att_list:
+                if a.FK != None:
+                    a.size = a.FK.size
+                    if a.FK.skip:
+                        raise Exception("reference on table {0} with skipped "
+                                        "tuples".format(a.FK.name))
+                    key = a.FK.atts[a.FKatt] if a.FKatt else a.FK.getPK()
+                    assert key.isUnique(), \
+                        "foreign key {0}.{1} target {2} must be unique". \
+                        format(a.table.name, a.name, key.name)
+                    # override default prefix
+                    assert not 'prefix' in a.params, \
+                        "no prefix on foreign key {0}.{1}". \
+                        format(a.table.name, a.name)
+                    a.params['prefix'] = key.params.get('prefix', key.name)
+                    # transfer all other directives
+                    for d, v in key.params.items():
+                        if not d in a.params:
+                            a.params[d] = v
+                elif 'size' in a.params:
+                    a.size = a.params['size']
+                elif a.size == None:
+                    a.size = int(t.size * a.params['mult'])
+        #
+        # CREATE DATA GENERATORS per attribute
+        #
+        # they draw from the random generator of their table, which
+        # continues the random sequence of the schema
+        state = self.random.getstate()
+        for t in self.tables:
+            t.random.setstate(state)
+            for a in t.att_list:
+                if 'nogen' in a.params:
+                    a.gen = None
+                elif 'type' in a.params:
+                    g = a.params['type']
+                    a.gen = \
+                        IntGenerator(a) if g == 'int' else \
+                        BoolGenerator(a) if g == 'bool' else \
+                        FloatGenerator(a) if g == 'float' else \
+                        DateGenerator(a) if g == 'date' else \
+                        TimestampGenerator(a) if g == 'timestamp' else \
+                        IntervalGenerator(a) if g == 'interval' else \
+                        StringGenerator(a) if g == 'string' else \
+                        CharsGenerator(a, a.params['chars']) \
+                            if g == 'chars' else \
+                        WordGenerator(a, a.params['word']) if g == 'word' else \
+                        TextGenerator(a, a.params['word']) if g == 'text' else \
+                        BlobGenerator(a) if g == 'blob' else \
+                        None
+                    assert a.gen, "generator type {0} found".format(g)
+                elif 'text' in a.params:
+                    assert db.textType(a.type), "text attribute for text"
+                    assert 'word' in a.params, "text generator requires word"
+                    a.gen = TextGenerator(a, a.params['word'])
+                elif 'word' in a.params:
+                    assert db.textType(a.type), "text attribute for word"
+                    a.gen = WordGenerator(a, a.params['word'])
+                elif 'chars' in a.params:
+                    assert db.textType(a.type), "text attribute for chars"
+                    a.gen = CharsGenerator(a, a.params['chars'])
+                # type-based default generators
+                elif a.is_enum:
+                    a.gen = WordGenerator(a, None, self.all_enums[a.type])
+                elif db.intType(a.type):
+                    a.gen = IntGenerator(a)
+                elif db.textType(a.type):
+                    a.gen = StringGenerator(a)
+                elif db.boolType(a.type):
+                    a.gen = BoolGenerator(a)
+                elif db.dateType(a.type):
+                    a.gen = DateGenerator(a)
+                elif db.timestampType(a.type):
+                    a.gen = TimestampGenerator(a)
+                elif db.intervalType(a.type):
+                    a.gen = IntervalGenerator(a)
+                elif db.floatType(a.type):
+                    a.gen = FloatGenerator(a)
+                elif db.blobType(a.type):
+                    a.gen = BlobGenerator(a)
+                else:
+                    a.gen = None
+            state = t.random.getstate()
+        # compound unique keys by construction
+        for t in self.tables:
+            if 'product' in t.params and not 'nogen' in t.params:
+                t.random.setstate(state)
+                t.setProduct()
+                state = t.random.getstate()
+        self.random.setstate(state)
+    def load(self, input):
+        # parse input or reuse a cached model, and create generators
+        opts = self.opts
+        model, cache = None, None
+        if opts.cache:
+            # input lines are hashed
+            input = list(input)
+            cache = os.path.join(opts.cache,
+                                 modelKey(opts, input) + '.pickle')
+            model = loadModel(cache)
+        elif opts.filter and self.lines == None:
+            # input lines are only kept to be shown
+            self.lines = []
+        if model != None:
+            self.setModel(model)
         else:
-            # UNIQUE()
-            u = unicity.match(line)
-            if u:
-                current_table.addUnique(re.split(r'[\s,]+',u.group(2)), \
-                                        u.group(1))
-    # attribute df stuff to current object: schema, table or attribute
-    # this come last if the dfstuff is on the same line as its object
-    if dfstuff!=None:
-        if current_attribute!=None:
-            current_attribute.setParams(dfstuff)
-        elif current_table!=None:
-            current_table.setParams(dfstuff)
+            self.parse(input)
+        if opts.cache and opts.filter:
+            self.lines = input
+        self.setDefaults()
+        # set seed, default uses os random or time
+        self.random.seed(opts.seed)
+        if model == None:
+            self.setup()
+            # without a seed, a saved model would fix random set up choices
+            if opts.cache and opts.seed:
+                saveModel(cache, self.getModel())
+    def chunks(self, t, first, last):
+        # yield kept tuples first..last-1 of table t as lists of columns
+        opts = self.opts
+        self.begin(t)
+        try:
+            # keys registered by a previous generation are forgotten
+            t.ustuff = None
+            # chunks start on multiples of the chunk size, and previous
+            # tuples are also generated to register compound unique keys
+            start = 0 if t.unique else first - first % opts.chunk
+            while start < last:
+                n = min(opts.chunk, t.size - start)
+                t.seek(start)
+                cols = t.getBatch(n)
+                # tuples are generated, but may nevertheless not be inserted
+                keep = t.skipMask(n) if t.skip else None
+                if start < first or start + n > last:
+                    keep = keep or [True] * n
+                    for i in range(n):
+                        keep[i] = keep[i] and first <= start + i < last
+                if keep:
+                    cols = [[v for v, k in zip(c, keep) if k] for c in cols]
+                start += n
+                if not cols or not cols[0]:
+                    continue
+                yield cols, start >= last
+        finally:
+            t.active = False
+    def rows(self, name):
+        # iterate over the tuples of a table as native python values,
+        # for its attributes with a generator
+        t = self.getTable(name)
+        if 'nogen' in t.params:
+            return
+        for cols, last in self.chunks(t, 0, t.size):
+            for tup in zip(*cols):
+                yield tup
+    def getRange(self, t):
+        # tuples first..last-1 of table t are output
+        if self.opts.shard:
+            k, n = self.opts.shard
+            return (k - 1) * t.size // n, k * t.size // n
+        return 0, t.size
+    def sampleTable(self, t, sample=1000):
+        # predict output tuples, bytes, unique index memory and time
+        # for table t from a sample of its tuples
+        opts, db = self.opts, self.db
+        first, last = self.getRange(t)
+        # parts are spread over the tuples, as widths grow with numbers
+        parts = min(4, sample, last - first)
+        n = min(sample, last - first) // parts * parts if parts else 0
+        nbytes, delay = 0, 0.0
+        self.begin(t)
+        try:
+            # the second run is timed, once caches are warm
+            for i in range(2 if n else 0):
+                t.ustuff = None
+                nbytes, start = 0, time.time()
+                for k in range(parts):
+                    t.seek(first + k * (last - first) // parts)
+                    cols = t.getBatch(n // parts)
+                    if opts.format == 'binary':
+                        nbytes += len(db.binaryBatch(t, cols))
+                    else:
+                        nbytes += len(db.insertBatch(t, cols, True).
+                                      encode('utf-8')) + 1
+                delay = time.time() - start
+        finally:
+            t.ustuff, t.active = None, False
+        # previous tuples are also generated for compound unique keys,
+        # and skipped tuples are generated but not output
+        generated = last if t.unique else last - first
+        rows = int((last - first) * (1.0 - t.skip))
+        return [rows, float(nbytes) * rows / n if n else 0.0,
+                float(UniqueIndex.memory(generated * len(t.unique),
+                                         sum(map(len, t.unique)) /
+                                         float(len(t.unique))))
+                if t.unique else 0.0,
+                delay * generated / n if n else 0.0]
+    def sample(self):
+        # list of generated tables with their predicted statistics
+        return [(t, self.sampleTable(t)) for t in self.tables
+                if not 'nogen' in t.params and t.size != 0]
+    def plan(self, file):
+        # show predicted statistics per table, without generating the data
+        line = "{0:<24} {1:>12} {2:>12} {3:>12} {4:>10}\n"
+        file.write(line.format('table', 'rows', 'MB', 'unique MB', 'seconds'))
+        total = [0, 0.0, 0.0, 0.0]
+        for t, stats in self.sample():
+            for i in range(4):
+                total[i] += stats[i]
+            file.write(line.format(t.name, stats[0], "{0:.1f}".
+                                   format(stats[1] / 1e6),
+                                   "{0:.1f}".format(stats[2] / 1e6),
+                                   "{0:.1f}".format(stats[3])))
+        # unique indexes are kept until the end of the run
+        file.write(line.format('total', total[0], "{0:.1f}".
+                               format(total[1] / 1e6), "{0:.1f}".
+                               format(total[2] / 1e6),
+                               "{0:.1f}".format(total[3])))
+    def fillTable(self, t, out):
+        opts, db = self.opts, self.db
+        out.writeln('')
+        if 'nogen' in t.params or t.size == 0:
+            out.writeln("-- skip table {0}".format(t.name))
+            return
+        size = "{:d}*{:g}".format(t.size, 1.0-t.skip) if t.skip \
+               else str(t.size)
+        first, last = self.getRange(t)
+        if opts.shard:
+            size += " shard {0}/{1}".format(*opts.shard)
+        out.writeln("-- fill table {0} ({1})".format(t.name, size))
+        out.writeln(db.echo("# filling table {0} ({1})".format(t.name, size)))
+        if opts.format == 'binary':
+            # data are written to a separate file loaded with \copy
+            name = os.path.join(opts.directory, t.name + '.pgcopy')
+            if opts.compress:
+                suffix, program = COMPRESS[opts.compress][3:]
+                name += suffix
+                out.writeln(db.binaryCopy(t, name, program))
+                file = open(name, 'wb')
+                data = Output(Compressor(file, opts.compress, opts.level,
+                                         opts.buffer, opts.jobs), opts.buffer)
+            else:
+                out.writeln(db.binaryCopy(t, name))
+                file = open(name, 'wb')
+                data = Output(file, opts.buffer)
+            data.write(db.binaryBegin())
         else:
-            schema.setParams(dfstuff)
-        dfstuff = None
-
-#
-# SET DEFAULT VALUES for some options, possibly from directives
-#
-if opts.size == None:
-    opts.size = schema.params.get('size', 100)
-
-if not opts.offset:
-    opts.offset = schema.params.get('offset')
-
-if not opts.mangle:
-    opts.mangle = 'mangle' in schema.params
-
-if not opts.null:
-    opts.null = schema.params.get('null', 0.01)
-
-if not opts.seed:
-    opts.seed = schema.params.get('seed')
-
-# set seed, default uses os random or time
-random.seed(opts.seed)
-
-#
-# START OUTPUT
-#
-print("-- data generated by {0} version {1} for {2}".
-      format(sys.argv[0], version, opts.target))
-
-if opts.transaction:
-    print('')
-    print(db.begin())
-
-#
-# DROP
-#
-if opts.drop:
-    print('')
-    print('-- drop tables')
-    for t in reversed(tables):
-        print(db.dropTable(t))
-
-#
-# SHOW INPUT
-#
-if opts.filter:
-    print('')
-    print('-- INPUT FILE BEGIN')
-    for line in lines:
-        sys.stdout.write(line)
-    print('-- INPUT FILE END')
-
-#
-# TRUNCATE
-#
-if opts.truncate:
-    print('')
-    print('-- truncate tables')
-    for t in filter(lambda t: not 'nogen' in t.params, reversed(tables)):
-        print(db.truncateTable(t))
-
-#
-# SET TABLE AND ATTRIBUTE SIZES
-#
-# first table sizes
-for t in tables:
-    # set skip
-    t.skip = t.params['skip'] if 'skip' in t.params else 0.0
-    assert t.skip >= 0.0 and t.skip <= 1.0
-    if t.size==None:
-        t.size = t.params['size'] if 'size' in t.params else \
-                 int(t.params['mult'] * opts.size)
-
-# *then* set att sizes and possible offset
-for t in tables:
-    for a in t.att_list:
-        if a.FK != None:
-            a.size = a.FK.size
-            if a.FK.skip:
-                raise Exception("reference on table {0} with skipped tuples".
-                                format(a.FK.name))
-            key = a.FK.atts[a.FKatt] if a.FKatt else a.FK.getPK()
-            assert key.isUnique(), \
-                "foreign key {0}.{1} target {2} must be unique". \
-                format(a.table.name, a.name, key.name)
-            # override default prefix
-            assert not 'prefix' in a.params, \
-                "no prefix on foreign key {0}.{1}".format(a.table.name, a.name)
-            a.params['prefix'] = key.params.get('prefix', key.name)
-            # transfer all other directives
-            for d, v in key.params.items():
-                if not d in a.params:
-                    a.params[d] = v
-        elif 'size' in a.params:
-            a.size = a.params['size']
-        elif a.size == None:
-            a.size = int(t.size * a.params['mult'])
+            out.writeln(db.insertBegin(t))
+        if self.progress != None:
+            self.progress.begin(t, first, last,
+                                data if opts.format == 'binary' else out)
+        profile = self.profile
+        try:
+            for cols, end in self.chunks(t, first, last):
+                start = time.time() if profile != None else None
+                if opts.format == 'binary':
+                    data.write(db.binaryBatch(t, cols))
+                else:
+                    out.writeln(db.insertBatch(t, cols, end))
+                if profile != None:
+                    profile.add(('format', t.name), start, len(cols[0]))
+                if self.progress != None:
+                    self.progress.update()
+            if opts.format == 'binary':
+                data.write(db.binaryEnd())
+                data.close()
+                if opts.compress:
+                    data.file.close()
+        except:
+            if opts.format == 'binary':
+                # do not leave a partial data file to be loaded
+                if opts.compress:
+                    data.file.abort()
+                file.close()
+                os.remove(name)
+            raise
+        if self.progress != None:
+            self.progress.update(True)
+        if opts.format == 'binary':
+            file.close()
+        else:
+            out.writeln(db.insertEnd())
+    def generate(self, sink=None, **options):
+        # write the data generation script to a file, by default the
+        # output option or stdout. Changing options reloads the schema.
+        if options:
+            assert self.lines != None, "input is kept to change options"
+            return load_schema(self.lines, **dict(self.options, **options)). \
+                generate(sink)
+        opts, db, tables = self.opts, self.db, self.tables
+        file = sink
+        if file == None:
+            file = open(opts.output, 'wb') if opts.output else \
+                   getattr(sys.stdout, 'buffer', sys.stdout)
+        if opts.compress:
+            if isinstance(file, io.TextIOBase):
+                raise Exception("compressed output requires a bytes file")
+            out = Output(Compressor(file, opts.compress, opts.level,
+                                    opts.buffer, opts.jobs), opts.buffer)
+        else:
+            out = Output(file, opts.buffer)
+        #
+        # START OUTPUT
+        #
+        # random draws depend on numpy, see --seed
+        out.writeln("-- data generated by {0} version {1} for {2} {3} numpy".
+                    format(sys.argv[0], version, opts.target,
+                           'with' if numpy != None else 'without'))
+        if opts.transaction:
+            out.writeln('')
+            out.writeln(db.begin())
+        # with shards, the first one does the setup and the last one the cleanup
+        first_shard = not opts.shard or opts.shard[0] == 1
+        last_shard = not opts.shard or opts.shard[0] == opts.shard[1]
+        #
+        # DROP
+        #
+        if opts.drop and first_shard:
+            out.writeln('')
+            out.writeln('-- drop tables')
+            for t in reversed(tables):
+                out.writeln(db.dropTable(t))
+        #
+        # SHOW INPUT
+        #
+        if opts.filter and first_shard:
+            out.writeln('')
+            out.writeln('-- INPUT FILE BEGIN')
+            for line in self.lines:
+                out.write(line)
+            out.writeln('-- INPUT FILE END')
+        #
+        # TRUNCATE
+        #
+        if opts.truncate and first_shard:
+            out.writeln('')
+            out.writeln('-- truncate tables')
+            for t in filter(lambda t: not 'nogen' in t.params,
+                            reversed(tables)):
+                out.writeln(db.truncateTable(t))
+        # print tables
+        if opts.debug:
+            sys.stderr.write(repr(tables))
+        if opts.progress:
+            total = sum(last - first for first, last in
+                        [self.getRange(t) for t in tables
+                         if not 'nogen' in t.params])
+            # rows are counted by all processes
+            done = None
+            if opts.jobs > 1:
+                import multiprocessing
+                done = multiprocessing.Value('d', 0)
+            self.progress = Progress(opts.progress, total, done)
+        #
+        # CALL GENERATORS on each table
+        #
+        if opts.jobs > 1:
+            # largest tables first, forked processes share the generators
+            # and write tables in spool files, which are removed even when
+            # a job fails
+            import tempfile
+            pool = forkContext().Pool(opts.jobs, setJobSchema, (self,))
+            jobs, names = {}, {}
+            try:
+                for i in sorted(range(len(tables)),
+                                key=lambda i: -tables[i].size):
+                    fd, names[i] = tempfile.mkstemp(prefix='datafiller_',
+                                                    dir=opts.directory)
+                    os.close(fd)
+                    jobs[i] = pool.apply_async(fillTableJob, (i, names[i]))
+                pool.close()
+                # output in table order
+                for i in range(len(tables)):
+                    stats = jobs[i].get()
+                    if stats:
+                        self.profile.merge(stats)
+                    with open(names[i], 'rb') as f:
+                        out.copy(f)
+                    os.remove(names.pop(i))
+                pool.join()
+            except:
+                pool.terminate()
+                pool.join()
+                raise
+            finally:
+                for name in names.values():
+                    if os.path.exists(name):
+                        os.remove(name)
+        else:
+            for t in tables:
+                self.fillTable(t, out)
+        #
+        # RESTART SEQUENCES
+        #
+        if last_shard:
+            out.writeln('')
+            out.writeln('-- restart sequences')
+            for t in filter(lambda t: not 'nogen' in t.params, tables):
+                for a in filter(lambda a: a.isSerial(), t.att_list):
+                    out.writeln(db.setSequence(t, a, a.gen.offset + a.gen.size))
+        #
+        # DONE
+        #
+        if opts.transaction:
+            out.writeln('')
+            out.writeln(db.commit())
+        if opts.target == 'postgresql' and last_shard:
+            out.writeln('')
+            out.writeln('-- analyze modified tables')
+            for t in filter(lambda t: not 'nogen' in t.params, tables):
+                out.writeln("ANALYZE {0};".format(t.getName()))
+        #
+        # validation
+        #
+        if opts.test == 'validate' and last_shard:
+            out.writeln(VALIDATE_CHECK)
+        out.close()
+        if opts.compress:
+            out.file.close()
+        if sink == None and opts.output:
+            file.close()
+        if self.profile != None:
+            self.profile.report(sys.stderr)
+
+# schema of a forked process, which is inherited rather than pickled
+job_schema = None
+
+def setJobSchema(schema):
+    global job_schema
+    job_schema = schema
+
+def forkContext():
+    # forked processes inherit the schema instead of pickling it
+    import multiprocessing
+    return multiprocessing.get_context('fork') \
+        if hasattr(multiprocessing, 'get_context') else multiprocessing
+
+# fill a table in a separate process, output is written in spool file name
+def fillTableJob(i, name):
+    schema, profile = job_schema, job_schema.profile
+    tmp = Output(open(name, 'wb'), schema.opts.buffer)
+    # a process may fill several tables, return statistics for this one
+    if profile != None:
+        profile.stats = {}
+    try:
+        schema.fillTable(schema.tables[i], tmp)
+        tmp.close()
+        tmp.file.close()
+    except:
+        tmp.file.close()
+        os.remove(name)
+        raise
+    return profile.stats if profile != None else None
 
 #
-# CREATE DATA GENERATORS per attribute
+# OPTIONS
 #
-for t in tables:
-    for a in t.att_list:
-        if 'nogen' in a.params:
-            a.gen = None
-        elif 'type' in a.params:
-            t = a.params['type']
-            a.gen = IntGenerator(a) if t == 'int' else \
-                    BoolGenerator(a) if t == 'bool' else \
-                    FloatGenerator(a) if t == 'float' else \
-                    DateGenerator(a) if t == 'date' else \
-                    TimestampGenerator(a) if t == 'timestamp' else \
-                    IntervalGenerator(a) if t == 'interval' else \
-                    StringGenerator(a) if t == 'string' else \
-                    CharsGenerator(a, a.params['chars']) if t == 'chars' else \
-                    WordGenerator(a, a.params['word']) if t == 'word' else \
-                    TextGenerator(a, a.params['word']) if t == 'text' else \
-                    BlobGenerator(a) if t == 'blob' else \
-                    None
-            assert a.gen, "generator type {0} found".format(t)
-        elif 'text' in a.params:
-            assert db.textType(a.type), "text attribute for text"
-            assert 'word' in a.params, "text generator requires word"
-            a.gen = TextGenerator(a, a.params['word'])
-        elif 'word' in a.params:
-            assert db.textType(a.type), "text attribute for word"
-            a.gen = WordGenerator(a, a.params['word'])
-        elif 'chars' in a.params:
-            assert db.textType(a.type), "text attribute for chars"
-            a.gen = CharsGenerator(a, a.params['chars'])
-        # type-based default generators
-        elif a.is_enum:
-            a.gen = WordGenerator(a, None, all_enums[a.type])
-        elif db.intType(a.type):
-            a.gen = IntGenerator(a)
-        elif db.textType(a.type):
-            a.gen = StringGenerator(a)
-        elif db.boolType(a.type):
-            a.gen = BoolGenerator(a)
-        elif db.dateType(a.type):
-            a.gen = DateGenerator(a)
-        elif db.timestampType(a.type):
-            a.gen = TimestampGenerator(a)
-        elif db.intervalType(a.type):
-            a.gen = IntervalGenerator(a)
-        elif db.floatType(a.type):
-            a.gen = FloatGenerator(a)
-        elif db.blobType(a.type):
-            a.gen = BlobGenerator(a)
-        else:
-            a.gen = None
+def getBytes(s):
+    # number of bytes with an optional k, M, G or T decimal unit
+    b = re.match(r'(\d+(\.\d*)?)\s*([kmgt]?)b?$', s, re.I)
+    if not b:
+        raise ValueError("unexpected number of bytes {0}".format(s))
+    return int(float(b.group(1)) * 1000 ** ' kmgt'.index(b.group(3).lower()
+                                                         or ' '))
 
-# print tables
-if opts.debug:
-    sys.stderr.write(tables)
+# --size=1000
+# --target=postgresql|mysql
+# --help is automatic
+def getOptions(argv=None):
+    # parse command line arguments, default is sys.argv
+    import argparse
+    opts = argparse.ArgumentParser(
+        description='Fill database tables with random data.')
+    opts.add_argument('-v', '--version', action='version',
+                      version="version {0}".format(version))
+    opts.add_argument('-s', '--size', type=int, default=None,
+                      help='scale to size')
+    opts.add_argument('-t', '--target', default='postgresql',
+                      help='generate for this engine')
+    opts.add_argument('-f', '--filter', action='store_true', default=False,
+                      help='also include input in output')
+    opts.add_argument('-T', '--transaction', action='store_true',
+                      help='wrap output in a transaction')
+    opts.add_argument('-S', '--seed', default=None,
+                      help='random generator seed')
+    opts.add_argument('-O', '--offset', type=int, default=None,
+                      help='set global offset for integer primary keys')
+    opts.add_argument('-M', '--mangle', action='store_true', default=False,
+                      help='use a random step for integer generation')
+    opts.add_argument('--truncate', action='store_true', default=False,
+                      help='truncate table contents before loading')
+    opts.add_argument('--drop', action='store_true', default=False,
+                      help='drop tables before reloading')
+    opts.add_argument('-D', '--debug', action='count',
+                      help='set debug mode')
+    opts.add_argument('-m', '--man', action='store_const', const=2,
+                      help='show man page')
+    opts.add_argument('-n', '--null', type=float, default=None,
+                      help='probability of generating a NULL value')
+    opts.add_argument('--pod', type=str, default='pod2usage -verbose 3',
+                      help='override pod2usage command')
+    opts.add_argument('--test', default=None,
+                      help='show output for an example')
+    opts.add_argument('--validate', action='store_true', default=False,
+                      help='shortcut for script validation')
+    opts.add_argument('--tries', type=int, default=10,
+                      help='how hard to try to satisfy unique constraints')
+    opts.add_argument('--chunk', type=int, default=10000,
+                      help='number of tuples generated together')
+    opts.add_argument('-o', '--output', default=None,
+                      help='write output to this file instead of stdout')
+    opts.add_argument('--buffer', type=int, default=1048576,
+                      help='output buffer size in bytes')
+    opts.add_argument('-F', '--format', choices=['text', 'binary'],
+                      default='text', help='format of generated data')
+    opts.add_argument('-Z', '--compress', choices=['gzip', 'lzma', 'zstd'],
+                      default=None, help='compress output and data files')
+    opts.add_argument('--level', type=int, default=None,
+                      help='compression level')
+    opts.add_argument('--directory', default='.',
+                      help='directory for per-table data files')
+    opts.add_argument('-j', '--jobs', type=int, default=1,
+                      help='number of processes generating tables')
+    opts.add_argument('--shard', default=None,
+                      help='generate only this part K/N of each table')
+    opts.add_argument('--cache', default=None,
+                      help='directory for caching parsed schemas')
+    opts.add_argument('--bench', action='store_true', default=False,
+                      help='run benchmarks and show results as JSON')
+    opts.add_argument('--baseline', default=None,
+                      help='compare benchmark results to this JSON file')
+    opts.add_argument('--threshold', type=float, default=0.2,
+                      help='relative slowdown reported as a regression')
+    opts.add_argument('--profile', action='store_true', default=False,
+                      help='show time spent per table and attribute')
+    opts.add_argument('--pstats', default=None,
+                      help='run with cProfile and save statistics to file')
+    opts.add_argument('--target-bytes', type=getBytes, default=None,
+                      help='choose size for this output volume')
+    opts.add_argument('--plan', action='store_true', default=False,
+                      help='predict output size and time, without data')
+    opts.add_argument('--progress', type=float, default=None,
+                      metavar='SECONDS',
+                      help='report progress on stderr every SECONDS')
+    opts.add_argument('-V', action='store_true', default=False,
+                      help='show short version on stdout')
+    opts.add_argument('file', nargs='*',
+                      help='process files, or stdin if empty')
+    return opts.parse_args(argv)
+
+def checkOptions(opts):
+    # shortcut
+    if opts.validate:
+        opts.test = 'validate'
+        opts.transaction = True
+    # option consistency
+    if opts.drop or opts.test:
+        opts.filter = True
+    if opts.shard and not isinstance(opts.shard, tuple):
+        shard = re.match(r'(\d+)/(\d+)$', opts.shard)
+        if not shard:
+            raise Exception("unexpected shard {0}, expecting K/N".
+                            format(opts.shard))
+        opts.shard = int(shard.group(1)), int(shard.group(2))
+        if not 1 <= opts.shard[0] <= opts.shard[1]:
+            raise Exception("shard {0}/{1} must be in 1..{1}".
+                            format(*opts.shard))
+    if opts.filter and opts.truncate:
+        raise Exception("option truncate does not make sense with option filter")
+    if opts.format == 'binary' and opts.target != 'postgresql':
+        raise Exception("binary format is only available for postgresql")
+    if opts.compress:
+        # fail now rather than on the first compressed block
+        module = { 'gzip': 'zlib', 'lzma': 'lzma',
+                   'zstd': 'zstandard' }[opts.compress]
+        try:
+            __import__(module)
+        except ImportError:
+            raise Exception("{0} compression requires module {1}".
+                            format(opts.compress, module))
+        low, high = COMPRESS[opts.compress][1:3]
+        if opts.level != None and not low <= opts.level <= high:
+            raise Exception("{0} compression level must be in {1}..{2}".
+                            format(opts.compress, low, high))
+    elif opts.level != None:
+        raise Exception("option level requires option compress")
+
+def getDatabase(target):
+    if target == 'postgresql':
+        return PostgreSQL()
+    elif target == 'mysql':
+        return MySQL()
+    else:
+        raise Exception("unexpected target database {0}".format(target))
 
 #
-# CALL GENERATORS on each table
+# LIBRARY
 #
-for t in tables:
-    print
-    if 'nogen' in t.params or t.size == 0:
-        print("-- skip table {0}".format(t.name))
+import copy
+
+def solveSize(opts, lines):
+    # load the schema with the size for an output of opts.target_bytes.
+    # Output bytes grow linearly with the size, except for tables with a
+    # size directive, but formatted widths may change with the size.
+    size = opts.size
+    for i in range(5):
+        o = copy.copy(opts)
+        o.size = size
+        s = Schema(o, getDatabase(o.target))
+        s.load(lines)
+        # the first size may come from a directive or the default
+        size = o.size
+        fixed, unit = 0.0, 0.0
+        for t, stats in s.sample():
+            if 'size' in t.params:
+                fixed += stats[1]
+            else:
+                unit += stats[1] / size
+        if unit == 0.0:
+            raise Exception("output does not depend on size")
+        new = max(1, int(round((opts.target_bytes - fixed) / unit)))
+        if abs(new - size) <= 0.01 * size:
+            break
+        size = new
+    return s
+
+def load_schema(text, **options):
+    # parse a schema from a string or lines, with options named as the
+    # long command line options, and create its generators
+    opts = getOptions([])
+    for k, v in options.items():
+        if not hasattr(opts, k):
+            raise Exception("unexpected option {0}".format(k))
+        setattr(opts, k, v)
+    checkOptions(opts)
+    lines = StringIO(text).readlines() \
+            if isinstance(text, (str, type(u''))) else list(text)
+    if opts.target_bytes:
+        s = solveSize(opts, lines)
     else:
-        size = "{:d}*{:g}".format(t.size, 1.0-t.skip) if t.skip else str(t.size)
-        print("-- fill table {0} ({1})".format(t.name, size))
-        print(db.echo("# filling table {0} ({1})".format(t.name, size)))
-        print(db.insertBegin(t))
-        for i in range(t.size):
-            # the tuple is generated, but may nevertheless not be inserted
-            tup = t.getData()
-            if not t.skip or not random.random() < t.skip:
-                print(db.insertValue(t, tup, i==t.size-1))
-        print(db.insertEnd())
+        s = Schema(opts, getDatabase(opts.target))
+        s.load(lines)
+    # input is kept so as to generate again with other options
+    s.lines = lines
+    return s
 
 #
-# RESTART SEQUENCES
+# BENCHMARK
 #
-print('')
-print('-- restart sequences')
-for t in filter(lambda t: not 'nogen' in t.params, tables):
-    for a in filter(lambda a: a.isSerial(), t.att_list):
-        print(db.setSequence(t, a, a.gen.offset + a.gen.size))
+import json
+
+def peakMemory():
+    # peak resident set size of the process in bytes, None if unknown
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+class Counter:
+    # bytes file which only counts its length
+    def __init__(self):
+        self.length = 0
+    def write(self, s):
+        self.length += len(s)
+    def flush(self):
+        pass
+
+def benchTime(name, size, rows, run, repeat=3):
+    # best time of run(), which returns the number of bytes generated or None
+    delays = []
+    for i in range(repeat):
+        start = time.time()
+        nbytes = run()
+        delays.append(time.time() - start)
+    delay = max(min(delays), 1e-6)
+    return { 'name': name, 'size': size, 'rows': rows,
+             'seconds': delay, 'rows_per_sec': rows / delay,
+             'bytes_per_sec': nbytes / delay if nbytes != None else None,
+             'peak_rss': peakMemory() }
+
+def benchRun(name, size, rows, run):
+    # benchTime in a forked process, so that the peak memory is for this run
+    # only, as it is never lowered for a process
+    if not hasattr(os, 'fork'):
+        return benchTime(name, size, rows, run)
+    mp = forkContext()
+    recv, send = mp.Pipe(False)
+    p = mp.Process(target=lambda: send.send(benchTime(name, size, rows, run)))
+    p.start()
+    send.close()
+    try:
+        return recv.recv()
+    except EOFError:
+        raise Exception("benchmark {0} size {1} failed".format(name, size))
+    finally:
+        recv.close()
+        p.join()
+
+def benchRows(s, t):
+    # generate the tuples of table t without formatting them
+    for tup in s.rows(t.name):
+        pass
+
+def benchFormat(s, skip):
+    # generate and format the tuples of tables of schema s not in skip
+    db, length = s.db, 0
+    for t in s.tables:
+        if 'nogen' in t.params or t.name in skip:
+            continue
+        for cols, last in s.chunks(t, 0, t.size):
+            if s.opts.format == 'binary':
+                length += len(db.binaryBatch(t, cols))
+            else:
+                length += len(db.insertBatch(t, cols, last).encode('utf-8'))
+    return length
+
+def benchOutput(s):
+    # generate the whole script of schema s
+    out = Counter()
+    s.generate(out)
+    return out.length
+
+def schemaRows(s, skip=()):
+    return sum(t.size for t in s.tables
+               if not 'nogen' in t.params and not t.name in skip)
+
+def runBench(opts):
+    # generators, targets and embedded schemas at increasing sizes
+    size = opts.size if opts.size else 10000
+    options = { 'seed': opts.seed if opts.seed else 'bench',
+                'chunk': opts.chunk, 'buffer': opts.buffer }
+    results, scales = [], {}
+    for n in [ size // 100, size // 10, size ]:
+        if n == 0:
+            continue
+        s = load_schema(BENCH, size=n, **options)
+        for t in s.tables:
+            results.append(benchRun(t.name, n, t.size,
+                                    lambda: benchRows(s, t)))
+        # mysql does not support blobs
+        for target, format, skip in [ ('postgresql', 'text', []),
+                                      ('postgresql', 'binary', []),
+                                      ('mysql', 'text', ['bench_blob']) ]:
+            s = load_schema(BENCH, size=n, target=target, format=format,
+                            **options)
+            results.append(benchRun('{0}-{1}'.format(target, format), n,
+                                    schemaRows(s, skip),
+                                    lambda: benchFormat(s, skip)))
+        for name, text in [ ('comics', COMICS), ('pgbench', PGBENCH) ]:
+            # scale so as to generate about n tuples, but not below
+            # the default size of the schema
+            if not name in scales:
+                s = load_schema(text, size=1000, **options)
+                scales[name] = \
+                    schemaRows(s) / 1000.0, s.df.params.get('size', 1)
+            rows, default = scales[name]
+            scale = max(default, int(n / rows))
+            if any(r['name'] == name and r['size'] == scale for r in results):
+                continue
+            s = load_schema(text, size=scale, **options)
+            results.append(benchRun(name, scale, schemaRows(s),
+                                    lambda: benchOutput(s)))
+    regressions = 0
+    if opts.baseline:
+        regressions = compareBench(results, opts.baseline, opts.threshold)
+    file = open(opts.output, 'w') if opts.output else sys.stdout
+    json.dump({ 'version': version, 'python': sys.version.split()[0],
+                'numpy': numpy != None, 'results': results },
+              file, indent=1, sort_keys=True)
+    file.write('\n')
+    if opts.output:
+        file.close()
+    return 1 if regressions else 0
+
+# shorter benchmarks are too noisy to be compared
+BENCH_SECONDS = 0.1
+
+def compareBench(results, baseline, threshold):
+    # mark and count results slower than the baseline beyond the threshold
+    with open(baseline) as f:
+        previous = dict(((r['name'], r['size']), r)
+                        for r in json.load(f)['results'])
+    regressions = 0
+    for r in results:
+        p = previous.get((r['name'], r['size']))
+        if p == None:
+            continue
+        r['baseline_rows_per_sec'] = p['rows_per_sec']
+        r['regression'] = \
+            min(r['seconds'], p['seconds']) >= BENCH_SECONDS and \
+            r['rows_per_sec'] < (1.0 - threshold) * p['rows_per_sec']
+        if r['regression']:
+            regressions += 1
+            sys.stderr.write("regression on {0} size {1}: {2:.0f} rows/s, "
+                             "baseline {3:.0f} rows/s\n".
+                             format(r['name'], r['size'], r['rows_per_sec'],
+                                    p['rows_per_sec']))
+    return regressions
 
 #
-# DONE
+# COMMAND LINE
 #
+def runTest(schema, ttype, params):
+    opts, db = schema.opts, schema.db
+    # int & bool generator tests
+    if ttype == 'bool':
+        gen = BoolGenerator(None, params)
+        val, n = [ 0, 0 ], 10000
+        for i in range(n):
+            val[gen.genData()] += 1
+        print("True: {:5.2f} %".format(100.0*val[1]/n))
+    elif ttype == 'int':
+        gen = IntGenerator(None, params)
+        gen.offset, gen.mangle = 0, opts.mangle
+        gen.setSize(params.get('size', opts.size if opts.size else 10))
+        val, n = [ 0 ] * gen.size, 1000 * gen.size
+        for v in gen.genBatch(n):
+            val[v] += 1
+        for i in range(gen.size):
+            print("{:4d}  {:5.2f} %".format(i, 100.0*val[i]/n))
+    elif ttype == 'float':
+        gen = FloatGenerator(None, params)
+        size = opts.size if opts.size else 10
+        print(sorted(gen.genBatch(size)))
+    elif ttype == 'blob':
+        gen = BlobGenerator(None, params)
+        for b in gen.genBatch(opts.size if opts.size else 10):
+            print(db.blobValue(b))
+    elif ttype == 'text':
+        assert 'word' in params, "text generator requires word"
+        att = Attribute('text', 1, 'TEXT')
+        att.not_null, att.size, att.schema = True, 1, schema
+        att.params.update(params)
+        gen = TextGenerator(att, params['word'])
+        size, nwords = opts.size if opts.size else 10000, 0
+        start = time.time()
+        for i in range(0, size, opts.chunk):
+            nwords += sum(len(t.split(' '))
+                          for t in gen.genBatch(min(opts.chunk, size - i)))
+        delay = time.time() - start
+        print("text: {0:d} rows, {1:.1f} words per row, {2:.0f} rows/s".
+              format(size, float(nwords) / size, size / delay))
+    else:
+        raise Exception("unexpected generator test {0}".format(ttype))
 
-if opts.transaction:
-    print('')
-    print(db.commit())
-
-if opts.target == 'postgresql':
-    print('')
-    print('-- analyze modified tables')
-    for t in filter(lambda t: not 'nogen' in t.params, tables):
-        print("ANALYZE {0};".format(t.getName()))
+def main(argv=None):
+    # shortcut for the short version, which is checked often by scripts
+    if (sys.argv[1:] if argv == None else argv) == ['-V']:
+        print(VERSION)
+        return
+    opts = getOptions(argv)
+    if opts.V:
+        print(VERSION)
+        return
+    test = re.match(r'(\w+):\s*(.*)', opts.test if opts.test else '')
+    if test:
+        # macros are needed to parse parameters
+        s = Schema(opts, getDatabase(opts.target))
+        runTest(s, test.group(1), getParams(test.group(2), s.df_macro))
+        return
+    checkOptions(opts)
+    if opts.man:
+        # hack to have pod from python
+        import tempfile
+        pod = tempfile.NamedTemporaryFile(mode='w')
+        pod.write(POD.format(comics=COMICS, pgbench=PGBENCH,
+                             script=sys.argv[0], version=version))
+        pod.flush()
+        os.system(opts.pod + ' ' + pod.name)
+        pod.close()
+        return
+    if opts.bench:
+        return runBench(opts)
+    #
+    # INPUT SCHEMA
+    #
+    if opts.test == 'comics':
+        input = StringIO(COMICS)
+    elif opts.test == 'pgbench':
+        input = StringIO(PGBENCH)
+    elif opts.test == 'validate':
+        input = StringIO(VALIDATE)
+    else:
+        import fileinput # despite the name this is really a filter...
+        input = fileinput.input(opts.file)
+    if opts.pstats:
+        import cProfile
+        prof = cProfile.Profile()
+        prof.enable()
+    if opts.target_bytes:
+        s = solveSize(opts, list(input))
+        sys.stderr.write("-- size {0} for about {1} bytes\n".
+                         format(s.opts.size, opts.target_bytes))
+        if not opts.plan:
+            s.plan(sys.stderr)
+    else:
+        s = Schema(opts, getDatabase(opts.target))
+        s.load(input)
+    if opts.plan:
+        file = open(opts.output, 'w') if opts.output else sys.stdout
+        s.plan(file)
+        if opts.output:
+            file.close()
+    else:
+        s.generate()
+    if opts.pstats:
+        prof.disable()
+        prof.dump_stats(opts.pstats)
 
-#
-# validation
-#
-if opts.test == 'validate':
-    print(VALIDATE_CHECK);
+if __name__ == '__main__':
+    sys.exit(main())
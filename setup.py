@@ -8,7 +8,7 @@ setup(
 
     include_package_data=True,
 
-    modules=['datafiller'],
+    py_modules=['datafiller'],
 
     install_requires=[
     ],
@@ -17,4 +17,13 @@ setup(
         'datafiller.py',
     ],
 
+    # the wrapper imports the byte-compiled module, which starts faster
+    # than running the script source. It cannot be named datafiller.py,
+    # as it would then import itself.
+    entry_points={
+        'console_scripts': [
+            'datafiller = datafiller:main',
+        ],
+    },
+
 )
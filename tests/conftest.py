@@ -0,0 +1,24 @@
+import os, sys
+from io import BytesIO
+import pytest
+
+# tests import the datafiller script from the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datafiller
+
+@pytest.fixture
+def generate():
+    # script generated for a schema text loaded with a seed and options,
+    # or for a loaded schema, which generate.load returns
+    def load(text=datafiller.COMICS, **options):
+        options.setdefault('seed', 'test')
+        return datafiller.load_schema(text, **options)
+    def generate(schema=datafiller.COMICS, **options):
+        if not isinstance(schema, datafiller.Schema):
+            schema = load(schema, **options)
+        script = BytesIO()
+        schema.generate(script)
+        return script.getvalue()
+    generate.load = load
+    return generate
@@ -0,0 +1,134 @@
+# binary COPY format, decoded back and compared to the generated values
+import os, struct
+from datetime import datetime, timedelta
+from decimal import Decimal
+import pytest
+import datafiller
+
+TYPES = """
+  CREATE TABLE types(
+    i2 SMALLINT NOT NULL,
+    w INTEGER NOT NULL, -- df: type=word word=:7,-8,9
+    r REAL NOT NULL,
+    n NUMERIC -- df: null=0.2
+  );
+"""
+
+EPOCH = datetime(2000, 1, 1)
+
+def decodeNumeric(b):
+    ndigits, weight, sign, dscale = struct.unpack('!hhHh', b[:8])
+    if sign == 0xC000:
+        return Decimal('NaN')
+    digits = struct.unpack('!' + 'h' * ndigits, b[8:])
+    v = sum(Decimal(d) * Decimal(10000) ** (weight - i)
+            for i, d in enumerate(digits))
+    return -v if sign == 0x4000 else v
+
+def decoder(t):
+    # function decoding a binary field of type t
+    unpack = lambda fmt: lambda b: struct.unpack('!' + fmt, b)[0]
+    if t == 'smallint':
+        return unpack('h')
+    elif t == 'integer':
+        return unpack('i')
+    elif t == 'real':
+        return unpack('f')
+    elif t == 'double precision':
+        return unpack('d')
+    elif t == 'numeric':
+        return decodeNumeric
+    elif t == 'boolean':
+        return lambda b: b != b'\x00'
+    elif t == 'date':
+        return lambda b: (EPOCH + timedelta(days=unpack('i')(b))).date()
+    elif t == 'timestamp':
+        return lambda b: EPOCH + timedelta(microseconds=unpack('q')(b))
+    elif t == 'interval':
+        # microseconds, days and months
+        return lambda b: struct.unpack('!qii', b)
+    elif t == 'bytea':
+        return bytes
+    else:
+        return lambda b: b.decode('utf-8')
+
+def decode(data, table):
+    # tuples of a binary COPY stream
+    assert data.startswith(b'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0))
+    decs = [decoder(a.type) for a in table.att_list if a.gen]
+    pos, tuples = 19, []
+    while True:
+        n, = struct.unpack('!h', data[pos:pos+2])
+        pos += 2
+        if n == -1:
+            break
+        assert n == len(decs)
+        tup = []
+        for d in decs:
+            length, = struct.unpack('!i', data[pos:pos+4])
+            pos += 4
+            if length == -1:
+                tup.append(None)
+            else:
+                tup.append(d(data[pos:pos+length]))
+                pos += length
+        tuples.append(tuple(tup))
+    assert pos == len(data)
+    return tuples
+
+def test_bench_types(generate, tmp_path):
+    s = generate.load(datafiller.BENCH, size=100, chunk=30, format='binary',
+                      directory=str(tmp_path))
+    script = generate(s)
+    for t in s.tables:
+        assert b"\\copy " + t.name.encode() in script
+        with open(os.path.join(str(tmp_path), t.name + '.pgcopy'), 'rb') as f:
+            tuples = decode(f.read(), t)
+        expected = list(s.rows(t.name))
+        if t.name == 'bench_interval':
+            unit = t.att_list[0].gen.unit
+            assert unit == 's'
+            expected = [((v * 1000000, 0, 0),) for v, in expected]
+        assert tuples == expected, t.name
+
+def test_other_types(generate, tmp_path):
+    s = generate.load(TYPES, size=200, format='binary',
+                      directory=str(tmp_path))
+    generate(s)
+    t = s.getTable('types')
+    with open(os.path.join(str(tmp_path), 'types.pgcopy'), 'rb') as f:
+        tuples = decode(f.read(), t)
+    fmt = s.db.formatter(t.getAttribute('n'))
+    nulls = 0
+    for got, (i2, w, r, n) in zip(tuples, s.rows('types')):
+        # words are converted from their text format
+        assert got[:2] == (i2, int(w))
+        assert got[2] == struct.unpack('!f', struct.pack('!f', r))[0]
+        if n is None:
+            nulls += 1
+            assert got[3] is None
+        else:
+            assert got[3] == Decimal(fmt(n))
+    assert len(tuples) == 200 and 0 < nulls < 200
+
+@pytest.mark.parametrize('s', ['0', '1', '-1', '0.5', '12345.6789',
+                               '-0.00012', '100000000', '9999.99990'])
+def test_numeric(s):
+    db = datafiller.getDatabase('postgresql')
+    b = datafiller.PostgreSQL.binaryNumeric(db, s)
+    length, = struct.unpack('!i', b[:4])
+    assert length == len(b) - 4
+    assert decodeNumeric(b[4:]) == Decimal(s)
+    # display scale
+    assert struct.unpack('!h', b[10:12])[0] == max(0, -Decimal(s).
+                                                   as_tuple().exponent)
+
+def test_failure_removes_data(generate, tmp_path, monkeypatch):
+    s = generate.load(datafiller.BENCH, size=100, chunk=30, format='binary',
+                      directory=str(tmp_path))
+    def fail(table, cols):
+        raise Exception("failed")
+    monkeypatch.setattr(s.db, 'binaryBatch', fail)
+    with pytest.raises(Exception, match="failed"):
+        generate(s)
+    assert os.listdir(str(tmp_path)) == []
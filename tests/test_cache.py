@@ -0,0 +1,54 @@
+# parsed schemas saved with --cache generate the same as parsed ones
+import os
+import pytest
+import datafiller
+
+WORDS = """
+  CREATE TABLE t( -- df: size=50
+    i INTEGER NOT NULL,
+    w TEXT NOT NULL -- df: word={0}
+  );
+"""
+
+@pytest.fixture
+def parses(monkeypatch):
+    # number of schemas actually parsed
+    count = []
+    parse = datafiller.Schema.parse
+    def counted(self, input):
+        count.append(1)
+        return parse(self, input)
+    monkeypatch.setattr(datafiller.Schema, 'parse', counted)
+    return count
+
+def test_cache_hit(generate, parses, tmp_path):
+    cache = str(tmp_path / 'cache')
+    plain = generate(size=20)
+    assert generate(size=20, cache=cache) == plain
+    assert len(os.listdir(cache)) == 1 and len(parses) == 2
+    assert generate(size=20, cache=cache) == plain
+    assert len(parses) == 2
+    # other options which change the model are another entry
+    generate(size=20, mangle=True, cache=cache)
+    assert len(os.listdir(cache)) == 2 and len(parses) == 3
+
+def test_word_file_changed(generate, parses, tmp_path):
+    cache, words = str(tmp_path / 'cache'), tmp_path / 'words.txt'
+    text = WORDS.format(str(words))
+    words.write_text(u'calvin\nhobbes\nsusie\nrosalyn\n')
+    generate(text, cache=cache)
+    words.write_text(u'moe\nwormwood\n')
+    plain = generate(text)
+    assert set(plain.split(b'\t')) & set([b'calvin\n', b'hobbes\n']) == set()
+    assert generate(text, cache=cache) == plain
+    assert len(parses) == 3
+    # the cache is saved again, for the current file
+    assert generate(text, cache=cache) == plain
+    assert len(parses) == 3
+
+def test_no_seed(generate, parses, tmp_path):
+    cache = str(tmp_path / 'cache')
+    generate(seed=None, cache=cache)
+    generate(seed=None, cache=cache)
+    assert not os.path.exists(cache) or os.listdir(cache) == []
+    assert len(parses) == 2
@@ -0,0 +1,72 @@
+# parallel and compressed generation output the same data
+import glob, gzip, lzma, os, tempfile
+import pytest
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'fork'),
+                                reason="jobs are forked processes")
+
+def files(directory):
+    contents = {}
+    for name in os.listdir(str(directory)):
+        with open(os.path.join(str(directory), name), 'rb') as f:
+            contents[name] = f.read()
+    return contents
+
+@pytest.mark.parametrize('jobs', [2, 3])
+@pytest.mark.parametrize('chunk', [7, 10000])
+def test_jobs(generate, jobs, chunk):
+    assert generate(chunk=chunk, jobs=jobs) == generate(chunk=chunk)
+
+def test_failed_job(generate, tmp_path):
+    # spool files of finished and failed tables are removed
+    text = """
+      CREATE TABLE pair( -- df: size=3
+        i INTEGER NOT NULL, -- df: size=2
+        UNIQUE(i)
+      );
+      CREATE TABLE big( -- df: size=5000
+        i INTEGER NOT NULL
+      );
+    """
+    spool = set(glob.glob(os.path.join(tempfile.gettempdir(), 'datafiller_*')))
+    with pytest.raises(Exception, match="cannot build tuple for table pair"):
+        generate(text, jobs=2, directory=str(tmp_path))
+    assert os.listdir(str(tmp_path)) == []
+    assert set(glob.glob(os.path.join(tempfile.gettempdir(),
+                                      'datafiller_*'))) <= spool
+
+def test_binary_jobs(generate, tmp_path):
+    one, two = tmp_path / 'one', tmp_path / 'two'
+    one.mkdir()
+    two.mkdir()
+    # scripts differ by the directory of data files
+    a = generate(format='binary', directory=str(one))
+    b = generate(format='binary', directory=str(two), jobs=2)
+    assert a.replace(str(one).encode(), b'') == \
+        b.replace(str(two).encode(), b'')
+    assert files(one) == files(two) and files(one)
+
+@pytest.mark.parametrize('method,decompress', [('gzip', gzip.decompress),
+                                               ('lzma', lzma.decompress)])
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_compress(generate, method, decompress, jobs):
+    plain = generate()
+    for level in (None, 1):
+        data = generate(compress=method, level=level, jobs=jobs)
+        assert decompress(data) == plain
+
+def test_compress_binary(generate, tmp_path):
+    plain = tmp_path / 'plain'
+    plain.mkdir()
+    generate(format='binary', directory=str(plain))
+    generate(format='binary', directory=str(tmp_path), compress='gzip',
+             jobs=2)
+    for name, data in files(plain).items():
+        with open(str(tmp_path / (name + '.gz')), 'rb') as f:
+            assert gzip.decompress(f.read()) == data
+
+def test_level(generate):
+    with pytest.raises(Exception, match="level must be in 0..9"):
+        generate(compress='gzip', level=10)
+    with pytest.raises(Exception, match="level requires option compress"):
+        generate(level=1)
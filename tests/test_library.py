@@ -0,0 +1,88 @@
+# the script imported as a module, see LIBRARY in the documentation
+import random
+from io import BytesIO
+import pytest
+import datafiller
+
+def test_rows(generate):
+    s = generate.load(size=10)
+    authors = list(s.rows('author'))
+    assert len(authors) == 10
+    assert all(len(t) == 4 for t in authors)
+    assert sorted(t[0] for t in authors) == list(range(1, 11))
+    # seeded schemas are reproducible, whatever else was generated
+    assert list(generate.load(size=10).rows('author')) == authors
+    assert list(s.rows('author')) == authors
+    # tables without generation have no tuples
+    assert list(s.rows('language')) == []
+
+def test_lines(generate):
+    lines = datafiller.COMICS.splitlines(True)
+    s = datafiller.load_schema(lines, seed='test', size=10)
+    assert list(s.rows('comics')) == \
+        list(generate.load(size=10).rows('comics'))
+
+def test_independent_schemas(generate):
+    # interleaved iterators of schemas with other options
+    a, b = generate.load(size=10), generate.load(size=20, mangle=True)
+    ia, ib = a.rows('comics'), b.rows('comics')
+    ra, rb = [], []
+    for x, y in zip(ia, ib):
+        ra.append(x)
+        rb.append(y)
+    ra.extend(ia)
+    rb.extend(ib)
+    assert ra == list(generate.load(size=10).rows('comics'))
+    assert rb == list(generate.load(size=20, mangle=True).rows('comics'))
+    assert (a.opts.size, b.opts.size) == (10, 20)
+
+def test_independent_seeds(generate):
+    # words of chars generators depend on the seed of their schema
+    words = [generate.load(seed=seed).getTable('author').
+             getAttribute('firstname').gen.lenData(8, 1)
+             for seed in ('test', 'other', 'test')]
+    assert words[0] != words[1] and words[0] == words[2]
+
+def test_words_kept(generate, monkeypatch):
+    # words not kept are built again the same
+    authors = list(generate.load(size=100).rows('author'))
+    monkeypatch.setattr(datafiller.CharsGenerator, 'WORDS', 10)
+    s = generate.load(size=100)
+    assert list(s.rows('author')) == authors
+    assert s.vocabularies and \
+        all(len(v) == 10 for v in s.vocabularies.values())
+
+def test_busy_table(generate):
+    s = generate.load(size=10)
+    rows = s.rows('comics')
+    next(rows)
+    with pytest.raises(Exception, match="already being generated"):
+        next(s.rows('comics'))
+    with pytest.raises(Exception, match="already being generated"):
+        generate(s)
+    # other tables are available, and the table once the iterator is done
+    assert len(list(s.rows('author'))) == 10
+    rows.close()
+    assert len(list(s.rows('comics'))) == 151
+
+def test_host_random(generate):
+    # the random module of the caller is left alone
+    random.seed(42)
+    state = random.getstate()
+    s = generate.load(size=10)
+    for t in s.tables:
+        list(s.rows(t.name))
+    generate(s)
+    assert random.getstate() == state
+
+def test_generate(generate):
+    out = BytesIO()
+    generate.load(size=10).generate(out, size=20)
+    again = BytesIO()
+    generate.load(size=20).generate(again)
+    assert out.getvalue() == again.getvalue()
+    assert b'COPY comics' in out.getvalue()
+
+def test_unexpected_option(generate):
+    with pytest.raises(Exception, match="unexpected option colour"):
+        generate.load(colour='blue')
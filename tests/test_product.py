@@ -0,0 +1,79 @@
+# compound unique keys enumerated with the product table directive
+import pytest
+
+PRODUCT = """
+  CREATE TABLE p( -- df: product size={size}
+    a INTEGER NOT NULL, -- df: size=30
+    b INTEGER NOT NULL, -- df: size=40
+    c TEXT NOT NULL,
+    x INTEGER NOT NULL, -- df: size=1000
+    y INTEGER NOT NULL, -- df: size=1000
+    UNIQUE(a, b),
+    UNIQUE(x, y)
+  );
+"""
+
+def keys(rows):
+    return [r[:2] for r in rows], [r[3:] for r in rows]
+
+@pytest.mark.parametrize('chunk', [7, 10000])
+def test_unique(generate, chunk):
+    s = generate.load(PRODUCT.format(size=1200), chunk=chunk)
+    ab, xy = keys(list(s.rows('p')))
+    # all keys of the product are used once
+    assert sorted(ab) == [(a, b) for a in range(1, 31) for b in range(1, 41)]
+    assert len(set(xy)) == 1200
+    # in a random order
+    assert ab != sorted(ab)
+    # without registering keys
+    assert s.getTable('p').unique == [] and s.getTable('p').ustuff == None
+
+def test_shards(generate):
+    # shards in order hold the tuples of a single run, keys included
+    text = PRODUCT.format(size=1000)
+    rows = list(generate.load(text, chunk=7).rows('p'))
+    parts = []
+    for k in (1, 2, 3):
+        s = generate.load(text, shard='{0}/3'.format(k), chunk=7)
+        t = s.getTable('p')
+        first, last = s.getRange(t)
+        for cols, end in s.chunks(t, first, last):
+            parts.extend(zip(*cols))
+    assert parts == rows
+
+def test_nomangle(generate):
+    # keys are enumerated in order, first attribute first
+    text = PRODUCT.replace('product', 'product nomangle').format(size=50)
+    ab, xy = keys(list(generate.load(text).rows('p')))
+    assert ab == [(a, b) for b in range(1, 41) for a in range(1, 31)][:50]
+    assert xy == [(x, 1) for x in range(1, 51)]
+
+@pytest.mark.parametrize('text,error', [
+    (PRODUCT.format(size=1201), "product on table p of size 1201 exceeds "
+                                "key product 1200"),
+    ("""
+      CREATE TABLE p( -- df: product
+        a INTEGER NOT NULL,
+        b INTEGER NOT NULL,
+        UNIQUE(a, b),
+        UNIQUE(b)
+      );
+     """, "product on table p with overlapping keys"),
+    ("""
+      CREATE TABLE p( -- df: product
+        a INTEGER NOT NULL,
+        b TEXT NOT NULL, -- df: chars='ab'
+        UNIQUE(a, b)
+      );
+     """, "product on table p requires integer based generators"),
+    ("""
+      CREATE TABLE p( -- df: product
+        a INTEGER NOT NULL,
+        b DOUBLE PRECISION NOT NULL,
+        UNIQUE(a, b)
+      );
+     """, "product on table p requires integer based generators")])
+def test_errors(generate, text, error):
+    # checked when the schema is loaded, before generating anything
+    with pytest.raises(Exception, match=error):
+        generate.load(text)
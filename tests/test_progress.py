@@ -0,0 +1,18 @@
+# progress reports on standard error
+import re
+import pytest
+
+def reports(err):
+    # table, done and size of progress lines
+    return re.findall(r'^progress: table (\w+) (\d+)/(\d+) rows', err, re.M)
+
+@pytest.mark.parametrize('interval', [0.000001, 1000.0])
+@pytest.mark.parametrize('chunk', [100, 10000])
+def test_reports(generate, capsys, interval, chunk):
+    generate(size=50, chunk=chunk, progress=interval)
+    lines = reports(capsys.readouterr().err)
+    tables = ['author', 'publisher', 'comics', 'inventory', 'written']
+    # each table ends with one complete report
+    assert [t for t, n, size in lines if n == size] == tables
+    if interval > 1:
+        assert len(lines) == len(tables)
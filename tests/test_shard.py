@@ -0,0 +1,46 @@
+# shards of a seeded run together generate the same data as the whole run
+import pytest
+import datafiller
+
+def copies(script):
+    # data lines of each COPY block in a script
+    tables, data = {}, None
+    for line in script.decode('utf-8').splitlines():
+        if line.startswith('COPY '):
+            data = tables.setdefault(line.split()[1], [])
+        elif line == '\\.':
+            data = None
+        elif data != None:
+            data.append(line)
+    return tables
+
+@pytest.mark.parametrize('text,size', [(datafiller.COMICS, 50),
+                                       (datafiller.PGBENCH, 2)])
+@pytest.mark.parametrize('n', [2, 3])
+def test_shards(generate, text, size, n):
+    whole = copies(generate(text, size=size))
+    shards = [copies(generate(text, size=size, shard='{0}/{1}'.format(k, n)))
+              for k in range(1, n + 1)]
+    assert whole and all(whole.values())
+    for name, lines in whole.items():
+        parts = [s[name] for s in shards]
+        # shards are consecutive ranges of tuples
+        assert sum(parts, []) == lines, name
+
+def test_setup_and_cleanup(generate):
+    # the first shard drops the tables, the last one restarts sequences
+    scripts = [generate(datafiller.COMICS, size=50, drop=True,
+                        shard='{0}/3'.format(k)) for k in (1, 2, 3)]
+    assert [b'DROP TABLE' in s for s in scripts] == [True, False, False]
+    assert [b'-- restart sequences' in s for s in scripts] == \
+        [False, False, True]
+
+def test_numpy_header(generate):
+    # shards join only if all run with numpy or all without it
+    header = generate(size=50, shard='1/2').split(b'\n')[0]
+    assert header.endswith(b' with numpy' if datafiller.numpy != None
+                           else b' without numpy')
+
+def test_shard_requires_seed(generate):
+    with pytest.raises(Exception, match="shard requires a seed"):
+        generate.load(seed=None, size=50, shard='1/2')
@@ -0,0 +1,32 @@
+# size solved for an output volume with --target-bytes
+import pytest
+import datafiller
+
+FIXED = """
+  CREATE TABLE t( -- df: size=100
+    i INTEGER NOT NULL
+  );
+"""
+
+@pytest.mark.parametrize('text,target', [(datafiller.COMICS, 200000),
+                                         (datafiller.COMICS, 1000000),
+                                         (datafiller.PGBENCH, 20000000)],
+                         ids=['comics-200k', 'comics-1M', 'pgbench-20M'])
+def test_target(generate, text, target):
+    s = generate.load(text, target_bytes=target)
+    assert abs(len(generate(s)) - target) < 0.05 * target
+
+def test_fixed_size(generate):
+    with pytest.raises(Exception, match="output does not depend on size"):
+        generate.load(FIXED, target_bytes=1000000)
+
+@pytest.mark.parametrize('s,n', [('1000', 1000), ('2M', 2000000),
+                                 ('1.5kB', 1500), ('500G', 500 * 10**9),
+                                 ('3t', 3 * 10**12)])
+def test_bytes(s, n):
+    assert datafiller.getBytes(s) == n
+
+@pytest.mark.parametrize('s', ['', 'M', '2X', '-1k'])
+def test_bad_bytes(s):
+    with pytest.raises(ValueError):
+        datafiller.getBytes(s)
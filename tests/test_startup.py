@@ -0,0 +1,69 @@
+# import and startup time budgets, see -X importtime for details
+import os, re, shutil, subprocess, sys, tempfile, time
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# seconds, several times the times measured on a laptop
+IMPORT_BUDGET = 0.2
+VERSION_BUDGET = 0.5
+
+def python(*args, **kwargs):
+    return subprocess.run([sys.executable] + list(args), cwd=ROOT, check=True,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True, **kwargs)
+
+def importTime():
+    # cumulative seconds spent importing datafiller
+    err = python('-X', 'importtime', '-c', 'import datafiller').stderr
+    for line in err.splitlines():
+        m = re.match(r'import time:\s*\d+\s*\|\s*(\d+)\s*\|\s*datafiller$',
+                     line)
+        if m:
+            return int(m.group(1)) / 1e6
+    raise Exception("no import time for datafiller in:\n" + err)
+
+def test_import_budget():
+    assert min(importTime() for i in range(3)) < IMPORT_BUDGET
+
+def test_import_is_lazy():
+    # slow modules and regexes are only loaded when needed
+    out = python('-c', 'import sys, datafiller\n'
+                 'print(sorted(m for m in ("argparse", "numpy", "tempfile",\n'
+                 '      "multiprocessing") if m in sys.modules))\n'
+                 'print(datafiller.new_object)').stdout
+    assert out.split('\n')[:2] == ['[]', 'None']
+
+def test_version_budget():
+    delays = []
+    for i in range(3):
+        start = time.time()
+        out = python('datafiller.py', '-V').stdout
+        delays.append(time.time() - start)
+    import datafiller
+    assert out.strip() == datafiller.VERSION
+    assert min(delays) < VERSION_BUDGET
+
+def test_console_script():
+    # install in a virtual environment without network, where the script
+    # and the wrapper of the module must run the version shortcut
+    pytest.importorskip('setuptools')
+    pytest.importorskip('wheel')
+    with tempfile.TemporaryDirectory() as tmp:
+        # from a copy, as building writes in the source directory
+        src = os.path.join(tmp, 'src')
+        os.mkdir(src)
+        for f in ('setup.py', 'datafiller.py'):
+            shutil.copy(os.path.join(ROOT, f), src)
+        env = os.path.join(tmp, 'env')
+        python('-m', 'venv', '--system-site-packages', env)
+        bin = os.path.join(env, 'Scripts' if os.name == 'nt' else 'bin')
+        subprocess.run([os.path.join(bin, 'python'), '-m', 'pip', 'install',
+                        '-q', '--no-deps', '--no-index',
+                        '--no-build-isolation', src], check=True, cwd=tmp)
+        out = [subprocess.run([os.path.join(bin, cmd), '-V'], check=True,
+                              cwd=tmp, stdout=subprocess.PIPE,
+                              universal_newlines=True).stdout.strip()
+               for cmd in ('datafiller.py', 'datafiller')]
+    import datafiller
+    assert out == [datafiller.VERSION] * 2
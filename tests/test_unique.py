@@ -0,0 +1,71 @@
+# unique keys are checked with a set of keys, or with numpy hashes
+import pytest
+import datafiller
+
+UNIQUE = """
+  CREATE TABLE pair( -- df: size=2
+    i INTEGER NOT NULL, -- df: offset=-2 size=2
+    UNIQUE(i)
+  );
+  CREATE TABLE key( -- df: size=20
+    a INTEGER NOT NULL, -- df: size=10
+    b TEXT NOT NULL, -- df: type=word word=:x,y,z,w
+    UNIQUE(a, b)
+  );
+"""
+
+@pytest.fixture(params=['set', 'numpy'])
+def mode(request, monkeypatch):
+    # with or without numpy, whatever is installed
+    numpy = None
+    if request.param == 'numpy':
+        numpy = pytest.importorskip('numpy')
+    monkeypatch.setattr(datafiller, 'numpy', numpy)
+    monkeypatch.setattr(datafiller, 'numpy_loaded', True)
+    return request.param
+
+def entries(keys):
+    return [datafiller.UniqueIndex.entry(1, [k], [isinstance(k, int)])
+            for k in keys]
+
+def test_index(mode):
+    u = datafiller.UniqueIndex()
+    keys = entries(list(range(-500, 500)) + ['a', 'b', None, 1.5])
+    for h in keys[::2]:
+        u.add(h)
+    assert len(u) == len(keys[::2])
+    assert all(h in u for h in keys[::2])
+    assert not any(h in u for h in keys[1::2])
+
+def test_insert(mode):
+    if mode != 'numpy':
+        pytest.skip("batches are checked with numpy")
+    numpy = datafiller.numpy
+    u = datafiller.UniqueIndex(chunk=7)
+    hs = datafiller.UniqueIndex.hashes(1, [list(range(1000))], [True])
+    u.insert(hs[:600])
+    assert len(u) == 600
+    assert u.lookup(hs.copy()).tolist() == [True] * 600 + [False] * 400
+    # the index grows with its keys, as predicted with the previous table
+    assert u.table.nbytes * 3 // 2 == datafiller.UniqueIndex.memory(600)
+    # hashes of one key are the same in batches
+    assert numpy.array_equal(hs, entries(list(range(1000))))
+
+def test_exact_keys(mode):
+    # python hashes of -1 and -2 are equal, keys must not be
+    if mode == 'set':
+        assert entries([-1]) != entries([-2])
+    s = datafiller.load_schema(UNIQUE, seed='unique')
+    assert sorted(s.rows('pair')) == [(-2,), (-1,)]
+
+@pytest.mark.parametrize('chunk', [3, 10000])
+def test_compound_keys(mode, chunk):
+    s = datafiller.load_schema(UNIQUE, seed='unique', chunk=chunk, tries=100)
+    rows = list(s.rows('key'))
+    assert len(rows) == 20 and len(set(rows)) == 20
+
+def test_too_few_keys(mode):
+    s = datafiller.load_schema(UNIQUE.replace('size=2\n', 'size=3\n', 1),
+                               seed='unique')
+    with pytest.raises(Exception, match="cannot build tuple for table pair"):
+        list(s.rows('pair'))
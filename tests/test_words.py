@@ -0,0 +1,94 @@
+# word files and their line index saved next to them
+import os
+import pytest
+import datafiller
+
+@pytest.fixture
+def words(tmp_path):
+    # write a word file, and return its path
+    path = tmp_path / 'words.txt'
+    def words(data):
+        path.write_bytes(data)
+        return str(path)
+    return words
+
+@pytest.fixture
+def finds(monkeypatch):
+    # number of files actually indexed
+    count = []
+    findEnds = datafiller.WordList.findEnds
+    def counted(self):
+        count.append(1)
+        return findEnds(self)
+    monkeypatch.setattr(datafiller.WordList, 'findEnds', counted)
+    return count
+
+def load(path):
+    l = datafiller.WordList(path)
+    return [l[i] for i in range(len(l))]
+
+def test_reuse(words, finds):
+    path = words(b'calvin\nhobbes\nsusie\n')
+    assert load(path) == ['calvin', 'hobbes', 'susie']
+    assert os.path.exists(path + '.dfidx') and len(finds) == 1
+    assert load(path) == ['calvin', 'hobbes', 'susie']
+    assert len(finds) == 1
+    assert datafiller.WordList(path).getBatch([2, 0]) == ['susie', 'calvin']
+
+def test_changed(words, finds):
+    path = words(b'calvin\nhobbes\nsusie\n')
+    load(path)
+    words(b'moe\nwormwood\n')
+    assert load(path) == ['moe', 'wormwood']
+    assert load(path) == ['moe', 'wormwood']
+    assert len(finds) == 2
+
+def test_broken_index(words, finds):
+    path = words(b'calvin\nhobbes\nsusie\n')
+    load(path)
+    with open(path + '.dfidx', 'r+b') as f:
+        f.truncate(os.path.getsize(path + '.dfidx') - 2)
+    assert load(path) == ['calvin', 'hobbes', 'susie']
+    assert load(path) == ['calvin', 'hobbes', 'susie']
+    assert len(finds) == 2
+
+@pytest.mark.skipif(not hasattr(os, 'geteuid') or os.geteuid() == 0,
+                    reason="directories are writable by root")
+def test_read_only(words, finds, tmp_path):
+    path = words(b'calvin\nhobbes\n')
+    os.chmod(str(tmp_path), 0o555)
+    try:
+        assert load(path) == ['calvin', 'hobbes']
+        assert os.listdir(str(tmp_path)) == ['words.txt']
+    finally:
+        os.chmod(str(tmp_path), 0o755)
+
+def test_not_saved(words, finds, tmp_path, monkeypatch):
+    # the index is not kept if it cannot be written
+    path = words(b'calvin\nhobbes\n')
+    def fail(src, dst):
+        raise OSError("cannot rename")
+    monkeypatch.setattr(os, 'rename', fail)
+    assert load(path) == ['calvin', 'hobbes']
+    assert os.listdir(str(tmp_path)) == ['words.txt']
+
+def test_no_last_newline(words, finds):
+    path = words(b'calvin\nhobbes\nsusie')
+    assert load(path) == ['calvin', 'hobbes', 'susie']
+    assert load(path) == ['calvin', 'hobbes', 'susie']
+    assert len(finds) == 1
+
+def test_empty(words, finds):
+    path = words(b'')
+    assert load(path) == []
+    assert load(path) == []
+    assert len(finds) == 1
+
+def test_generator(generate, words):
+    text = """
+      CREATE TABLE t( -- df: size=100
+        w TEXT NOT NULL -- df: word={0}
+      );
+    """.format(words(b'calvin\nhobbes\nsusie'))
+    rows = list(generate.load(text).rows('t'))
+    assert set(rows) == set([('calvin',), ('hobbes',), ('susie',)])